@@ -8,9 +8,137 @@
 3.进行模糊综合运算，得出综合评价结果
 """
 
+import csv
 import math
+import os
+import tempfile
 import numpy as np
 
+def assign_levels(values, n_levels, threshold=None, bounds=None):
+    """
+    把指标取值划分到等级
+    :param values: 指标取值数组
+    :param n_levels: 等级数量
+    :param threshold: 阈值列表，取值不大于第j个阈值（按顺序第一个满足的）时属于第j级，都不满足时属于最后一级
+    :param bounds: 未给阈值时使用的(最小值, 最大值)，按区间等分为n_levels级
+    :return: 等级编号数组
+    """
+    values = np.asarray(values)
+    if threshold is not None:
+        if len(threshold) >= n_levels:
+            raise ValueError("阈值个数应小于等级数，{}个等级最多{}个阈值".format(n_levels, n_levels - 1))
+        # 累计最大值单调不减，第一个满足 value <= t 的位置即为 searchsorted 的结果
+        edges = np.maximum.accumulate(np.asarray(threshold, dtype=float))
+        level_idx = np.searchsorted(edges, values, side='left')
+        level_idx[level_idx == len(edges)] = n_levels - 1
+        return level_idx
+    min_val, max_val = bounds
+    interval = (max_val - min_val) / n_levels
+    if interval == 0:  # 所有取值相同
+        return np.zeros(values.shape, dtype=np.intp)
+    level_idx = ((values - min_val) / interval).astype(np.intp)
+    return np.clip(level_idx, 0, n_levels - 1)
+
+
+def entropy_weights(membership_matrix):
+    """
+    熵权法的向量化实现
+    :param membership_matrix: 隶属度矩阵，形状为(..., n_indicators, n_levels)，前面的维度可以是批量维度
+    :return: 权重数组，形状为(..., n_indicators)
+    """
+    membership_matrix = np.asarray(membership_matrix, dtype=float)
+    n_indicators, n_levels = membership_matrix.shape[-2:]
+    k = -1 / math.log(n_levels)
+    positive = membership_matrix > 0
+    plogp = np.where(positive, membership_matrix * np.log(np.where(positive, membership_matrix, 1)), 0)
+    entropies = k * plogp.sum(axis=-1)
+    return (1 - entropies) / (n_indicators - entropies.sum(axis=-1, keepdims=True))
+
+
+def frequency_counts(data, min_vals, gaps, p):
+    """
+    各指标的分组频数（向量化直方图），所有指标一次计算
+    第k组为[最小值 + k * gap, 最小值 + (k + 1) * gap)，最大值计入最后一组
+    :param data: 数据矩阵，形状为(n_samples, n_indicators)
+    :param min_vals: 各指标的最小值
+    :param gaps: 各指标的组距
+    :param p: 分组数
+    :return: 频数矩阵，形状为(n_indicators, p)
+    """
+    n_indicators = data.shape[1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        group_idx = np.minimum(np.floor((data - min_vals) / gaps), p - 1)
+    valid = group_idx >= 0
+    flat_idx = (group_idx + np.arange(n_indicators) * p)[valid].astype(np.intp)
+    return np.bincount(flat_idx, minlength=n_indicators * p).reshape(n_indicators, p)
+
+
+def frequency_weights(counts, min_vals, gaps):
+    """
+    由分组频数计算频数统计法的权重：取频数最大的组（并列时取靠前的组）的组中值，再归一化
+    :param counts: frequency_counts得到的频数矩阵
+    :param min_vals: 各指标的最小值
+    :param gaps: 各指标的组距
+    :return: 权重向量
+    """
+    max_idx = np.argmax(counts, axis=1)
+    weights = min_vals + (max_idx + 0.5) * gaps
+    return weights / np.sum(weights)
+
+
+def bootstrap_entropy_batch(level_matrix, n_levels, seeds):
+    """
+    一批自助重抽样的熵权，所有重抽样和指标的等级计数都用bincount一次完成
+    :param level_matrix: 等级编号矩阵，形状为(n_samples, n_indicators)
+    :param n_levels: 等级数量
+    :param seeds: 每次重抽样各自的SeedSequence，结果与如何分批无关
+    :return: 权重数组，形状为(len(seeds), n_indicators)
+    """
+    n_boot = len(seeds)
+    n_samples, n_indicators = level_matrix.shape
+    sample_idx = np.stack([np.random.default_rng(s).integers(0, n_samples, n_samples) for s in seeds])
+    offsets = (np.arange(n_boot) * n_levels)[:, None]
+    counts = np.empty((n_boot, n_indicators, n_levels))
+    for i in range(n_indicators):
+        codes = level_matrix[:, i][sample_idx] + offsets
+        counts[:, i, :] = np.bincount(codes.ravel(), minlength=n_boot * n_levels).reshape(n_boot, n_levels)
+    return entropy_weights(counts / n_samples)
+
+
+def _bootstrap_entropy_task(path, n_levels, seeds, batch_size):
+    """
+    进程池中执行的一组重抽样：等级编号矩阵以内存映射方式从临时文件读取，不随任务传递
+    文件中保存的是转置后的矩阵，每个指标的等级编号连续存放
+    """
+    level_matrix = np.load(path, mmap_mode='r').T
+    return np.vstack([bootstrap_entropy_batch(level_matrix, n_levels, seeds[start:start + batch_size])
+                      for start in range(0, len(seeds), batch_size)])
+
+
+def compose(membership_matrix, weights, levels):
+    """
+    模糊综合运算：按权重合成各指标的隶属度，并确定最终评价等级
+    :param membership_matrix: 隶属度矩阵，形状为(n_indicators, n_levels)
+    :param weights: 权重列表
+    :param levels: 评价等级列表
+    :return: 综合评价结果字典
+    """
+    membership_matrix = np.asarray(membership_matrix, dtype=float)
+    result = np.asarray(weights, dtype=float) @ membership_matrix
+    
+    # 确定最终评价等级
+    max_idx = np.argmax(result)
+    final_level = levels[max_idx]
+    
+    return {
+        'weights': weights,
+        'membership_matrix': membership_matrix.tolist(),
+        'scores': result.tolist(),
+        'final_level': final_level,
+        'level_scores': {levels[i]: result[i] for i in range(len(levels))}
+    }
+
+
 class FuzzyEvaluation:
     """模糊综合评价类"""
     
@@ -33,37 +161,29 @@ class FuzzyEvaluation:
         计算每个指标在各个等级下的隶属度（频率）
         :return: 隶属度矩阵，形状为(n_indicators, n_levels)
         """
-        membership_matrix = []
+        membership_matrix = np.zeros((self.n_indicators, self.n_levels))
         
         for i in range(self.n_indicators):
-            indicator_data = self.data_matrix[:, i]
-            level_counts = [0] * self.n_levels
-            
-            # 根据阈值划分等级并统计
-            if self.thresholds and i < len(self.thresholds):
-                threshold = self.thresholds[i]
-                for value in indicator_data:
-                    assigned = False
-                    for j, t in enumerate(threshold):
-                        if value <= t:
-                            level_counts[j] += 1
-                            assigned = True
-                            break
-                    if not assigned:
-                        level_counts[-1] += 1
-            else:
-                # 默认等分
-                min_val, max_val = np.min(indicator_data), np.max(indicator_data)
-                interval = (max_val - min_val) / self.n_levels
-                for value in indicator_data:
-                    level_idx = min(int((value - min_val) / interval), self.n_levels - 1)
-                    level_counts[level_idx] += 1
-            
-            # 转换为频率（隶属度）
-            membership = [count / self.n_samples for count in level_counts]
-            membership_matrix.append(membership)
-        
-        return np.array(membership_matrix)
+            level_idx = self.level_index(i, self.data_matrix[:, i])
+            # 统计各等级的样本数
+            membership_matrix[i] = np.bincount(level_idx, minlength=self.n_levels)
+        
+        # 转换为频率（隶属度）
+        return membership_matrix / self.n_samples
+    
+    def level_index(self, i, values, bounds=None):
+        """
+        计算第i个指标的取值所属的等级编号
+        :param i: 指标序号
+        :param values: 该指标的取值数组
+        :param bounds: 等分时使用的(最小值, 最大值)，默认取values的最小值和最大值
+        :return: 等级编号数组，与values等长
+        """
+        if self.thresholds and i < len(self.thresholds):
+            return assign_levels(values, self.n_levels, threshold=self.thresholds[i])
+        if bounds is None:
+            bounds = (np.min(values), np.max(values))
+        return assign_levels(values, self.n_levels, bounds=bounds)
     
     def entropy_weight(self, membership_matrix):
         """
@@ -71,60 +191,26 @@ class FuzzyEvaluation:
         :param membership_matrix: 隶属度矩阵
         :return: 权重列表
         """
-        k = -1 / math.log(self.n_levels)
-        entropies = []
-        
-        for i in range(self.n_indicators):
-            entropy_sum = 0
-            for j in range(self.n_levels):
-                if membership_matrix[i][j] > 0:
-                    entropy_sum += membership_matrix[i][j] * math.log(membership_matrix[i][j])
-            entropy = k * entropy_sum
-            entropies.append(entropy)
-        
-        # 计算权重
-        entropy_sum = sum(entropies)
-        weights = [(1 - e) / (self.n_indicators - entropy_sum) for e in entropies]
-        
-        return weights
+        return entropy_weights(membership_matrix).tolist()
     
-    def frequency_weight(self, p=10):
+    def frequency_weight(self, p=10, chunk_size=65536):
         """
         频数统计法确定权重
         :param p: 分组数
+        :param chunk_size: 每次统计的样本数，限制临时数组的大小
         :return: 权重向量
         """
-        weights = np.zeros(self.n_indicators)
+        data = np.asarray(self.data_matrix, dtype=float)
+        min_vals, max_vals = data.min(axis=0), data.max(axis=0)
+        gaps = (max_vals - min_vals) / p
         
-        for i in range(self.n_indicators):
-            indicator_data = self.data_matrix[:, i]
-            maximum = np.max(indicator_data)
-            minimum = np.min(indicator_data)
-            gap = (maximum - minimum) / p
-            
-            # 创建分组区间
-            groups = []
-            item = minimum
-            while item < maximum:
-                groups.append([item, item + gap])
-                item = item + gap
-            
-            # 统计频数
-            freq_dict = {str(k): 0 for k in range(len(groups))}
-            for value in indicator_data:
-                for k in range(len(groups)):
-                    if value >= groups[k][0] and value < groups[k][1]:
-                        freq_dict[str(k)] += 1
-                        break
-            
-            # 取最大频数对应的组中值
-            max_idx = int(max(freq_dict, key=freq_dict.get))
-            mid = (groups[max_idx][0] + groups[max_idx][1]) / 2
-            weights[i] = mid
-        
-        # 归一化
-        weights = weights / np.sum(weights)
-        return weights
+        # 统计频数
+        counts = np.zeros((self.n_indicators, p), dtype=np.int64)
+        for start in range(0, self.n_samples, chunk_size):
+            counts += frequency_counts(data[start:start + chunk_size], min_vals, gaps, p)
+        
+        # 取最大频数对应的组中值并归一化
+        return frequency_weights(counts, min_vals, gaps)
     
     def comprehensive_evaluation(self, weights=None, method='entropy'):
         """
@@ -138,69 +224,618 @@ class FuzzyEvaluation:
         
         # 计算或使用给定的权重
         if weights is None:
-            if method == 'entropy':
-                weights = self.entropy_weight(membership_matrix)
-            elif method == 'frequency':
-                weights = self.frequency_weight()
-            else:
-                weights = [1/self.n_indicators] * self.n_indicators  # 平均权重
+            weights = self.compute_weights(method, membership_matrix)
         
         # 模糊综合运算
-        result = np.zeros(self.n_levels)
-        for i in range(self.n_indicators):
-            for j in range(self.n_levels):
-                result[j] += weights[i] * membership_matrix[i][j]
+        return compose(membership_matrix, weights, self.levels)
+    
+    def bootstrap_entropy_weight(self, n_boot=1000, alpha=0.05, seed=None, batch_size=None, executor=None):
+        """
+        用自助法估计熵权的置信区间
+        每次重抽样在样本中有放回地抽取n_samples行，重新统计隶属度并计算熵权；
+        各样本的等级按全样本确定（等分的区间不随重抽样变化）
+        :param n_boot: 重抽样次数
+        :param alpha: 显著性水平，返回1 - alpha的百分位区间
+        :param seed: 随机数种子，每次重抽样使用由它派生的独立种子，结果与是否并行、使用几个进程无关
+        :param batch_size: 每次bincount处理的重抽样次数，默认使抽样下标约为400万个，限制内存占用
+        :param executor: concurrent.futures执行器（如ProcessPoolExecutor），为None时在当前进程中计算；
+                         并行时重抽样分成执行器进程数4倍的任务，等级编号矩阵写入临时文件，各进程以内存映射方式共享
+        :return: 字典，包含'weights'(全样本熵权)、'lower'、'upper'(各指标区间的上下限)和'samples'(全部重抽样的熵权)
+        """
+        level_matrix = np.column_stack([self.level_index(i, self.data_matrix[:, i])
+                                        for i in range(self.n_indicators)]).astype(np.min_scalar_type(self.n_levels))
+        if batch_size is None:
+            batch_size = max(1, 2 ** 22 // self.n_samples)
+        seeds = np.random.SeedSequence(seed).spawn(n_boot)
         
-        # 确定最终评价等级
-        max_idx = np.argmax(result)
-        final_level = self.levels[max_idx]
+        if executor is None:
+            samples = np.vstack([bootstrap_entropy_batch(level_matrix, self.n_levels, seeds[start:start + batch_size])
+                                 for start in range(0, n_boot, batch_size)])
+        else:
+            workers = getattr(executor, '_max_workers', None) or os.cpu_count() or 1
+            task_size = -(-n_boot // (4 * workers))
+            tasks = [seeds[start:start + task_size] for start in range(0, n_boot, task_size)]
+            fd, path = tempfile.mkstemp(suffix='.npy')
+            os.close(fd)
+            try:
+                np.save(path, np.ascontiguousarray(level_matrix.T))
+                samples = np.vstack(list(executor.map(_bootstrap_entropy_task, [path] * len(tasks),
+                                                      [self.n_levels] * len(tasks), tasks,
+                                                      [batch_size] * len(tasks))))
+            finally:
+                os.remove(path)
         
+        lower, upper = np.percentile(samples, [100 * alpha / 2, 100 * (1 - alpha / 2)], axis=0)
         return {
-            'weights': weights,
-            'membership_matrix': membership_matrix.tolist(),
-            'scores': result.tolist(),
-            'final_level': final_level,
-            'level_scores': {self.levels[i]: result[i] for i in range(self.n_levels)}
+            'weights': np.asarray(self.entropy_weight(self.calculate_membership())),
+            'lower': lower,
+            'upper': upper,
+            'samples': samples
         }
+    
+    def compute_weights(self, method='entropy', membership_matrix=None):
+        """
+        按指定方法计算指标权重
+        :param method: 'entropy'(熵权法)、'frequency'(频数统计法)，其他值为平均权重
+        :param membership_matrix: 熵权法使用的隶属度矩阵，为None时重新计算
+        :return: 权重列表
+        """
+        if method == 'entropy':
+            if membership_matrix is None:
+                membership_matrix = self.calculate_membership()
+            return self.entropy_weight(membership_matrix)
+        elif method == 'frequency':
+            return self.frequency_weight()
+        return [1/self.n_indicators] * self.n_indicators  # 平均权重
+    
+    def level_edges(self):
+        """
+        每个指标相邻等级之间的分界点：有阈值的指标取阈值的累计最大值（与assign_levels按顺序第一个满足的规则一致），
+        否则把[最小值, 最大值]等分
+        :return: 形状为(n_indicators, n_levels - 1)的数组
+        """
+        min_vals, max_vals = self.data_matrix.min(axis=0), self.data_matrix.max(axis=0)
+        edges = min_vals[:, None] + ((max_vals - min_vals) / self.n_levels)[:, None] * np.arange(1, self.n_levels)
+        for i in range(min(len(self.thresholds or []), self.n_indicators)):
+            if len(self.thresholds[i]) != self.n_levels - 1:
+                raise ValueError("第{}个指标的阈值个数应为等级数减1".format(i))
+            edges[i] = np.maximum.accumulate(np.asarray(self.thresholds[i], dtype=float))
+        return edges
+    
+    def crisp_above(self, data):
+        """
+        按分界硬划分时，样本是否属于第k个分界以上的等级，与calculate_membership的划分完全一致：
+        有阈值的指标取值等于分界时属于下一级（x > t），等分的指标取值等于分界时属于上一级（floor的规则）
+        :param data: 数据矩阵，形状为(n_samples, n_indicators)
+        :return: 形状为(n_samples, n_indicators, n_levels - 1)的布尔数组
+        """
+        edges = self.level_edges()
+        min_vals, max_vals = self.data_matrix.min(axis=0), self.data_matrix.max(axis=0)
+        interval = (max_vals - min_vals) / self.n_levels
+        x = data[:, :, None]
+        above = x > edges
+        n_thresholds = min(len(self.thresholds or []), self.n_indicators)
+        if n_thresholds < self.n_indicators:
+            # 与assign_levels相同，按(x - 最小值) / 区间长度的整数部分确定等级；取值全相同时都属于第一级
+            with np.errstate(divide='ignore', invalid='ignore'):
+                scaled = (x[:, n_thresholds:] - min_vals[n_thresholds:, None]) / interval[n_thresholds:, None]
+            above[:, n_thresholds:] = scaled >= np.arange(1, self.n_levels)
+        return above
+    
+    def membership_functions(self, width=1.0):
+        """
+        隶属函数的参数，见sample_membership
+        :param width: 过渡带宽度系数，取值[0, 1]
+        :return: (edges, half)，分别为各分界点和过渡带的半宽，形状均为(n_indicators, n_levels - 1)
+        """
+        edges = self.level_edges()
+        outer = np.column_stack([self.data_matrix.min(axis=0), edges, self.data_matrix.max(axis=0)])
+        gaps = np.maximum(np.diff(outer, axis=1), 0)
+        half = width * np.minimum(gaps[:, :-1], gaps[:, 1:]) / 2
+        return edges, half
+    
+    def sample_membership(self, data=None, width=1.0, functions=None):
+        """
+        计算每个样本在各指标各等级下的隶属度
+        隶属函数以level_edges为等级分界，在分界t附近的[t-d, t+d]内线性过渡，其余位置为0或1，
+        d取width乘以t两侧较短区间（含数据最小值、最大值到首末分界的区间）长度的一半。
+        width=0时退化为按分界硬划分；width=1时过渡带延伸到较短相邻区间的中点，相邻区间等长时中间等级为三角形
+        隶属函数，其余情况为梯形隶属函数。每个样本在各等级上的隶属度之和为1
+        :param data: 数据矩阵，默认为self.data_matrix
+        :param width: 过渡带宽度系数，取值[0, 1]
+        :param functions: membership_functions的返回值，分块计算时传入以免重复计算
+        :return: 形状为(n_samples, n_indicators, n_levels)的隶属度数组
+        """
+        data = self.data_matrix if data is None else np.asarray(data)
+        edges, half = self.membership_functions(width) if functions is None else functions
+        
+        x = data[:, :, None]
+        # above[..., k]为样本超过第k个分界的程度
+        above = x - edges
+        above += half
+        with np.errstate(divide='ignore', invalid='ignore'):
+            above /= 2 * half
+        np.clip(above, 0, 1, out=above)
+        if not np.all(half > 0):  # 过渡带宽度为0时按分界硬划分
+            above = np.where(half > 0, above, self.crisp_above(data))
+        return np.concatenate([1 - above[..., :1], above[..., :-1] - above[..., 1:], above[..., -1:]], axis=-1)
+    
+    def sample_scores(self, weights=None, method='entropy', data=None, width=1.0, chunk_size=65536):
+        """
+        逐个样本进行模糊综合评价
+        :param weights: 权重列表，为None时按method计算（与comprehensive_evaluation相同）
+        :param method: 权重计算方法
+        :param data: 待评价的数据矩阵，默认为self.data_matrix；分界和隶属函数始终由self.data_matrix确定
+        :param width: 隶属函数过渡带宽度系数，见sample_membership
+        :param chunk_size: 每次处理的样本数，限制中间数组的大小
+        :return: (scores, level_idx)，scores形状为(n_samples, n_levels)，level_idx为每个样本得分最高的等级编号
+        """
+        if weights is None:
+            weights = self.compute_weights(method)
+        weights = np.asarray(weights, dtype=float)
+        data = self.data_matrix if data is None else np.asarray(data)
+        
+        functions = self.membership_functions(width)
+        scores = np.empty((data.shape[0], self.n_levels))
+        for start in range(0, data.shape[0], chunk_size):
+            membership = self.sample_membership(data[start:start + chunk_size], functions=functions)
+            # 对每个样本用权重合成各指标的隶属度
+            scores[start:start + chunk_size] = np.tensordot(membership, weights, axes=([1], [0]))
+        return scores, np.argmax(scores, axis=1)
 
 
-def fuzzy_evaluate_from_excel(file_path, sheet_name, indicator_cols, thresholds=None, method='entropy'):
+# FuzzyNode.set_data的默认参数，表示沿用原来的阈值
+_KEEP_THRESHOLDS = object()
+
+
+class FuzzyNode:
     """
-    从Excel文件读取数据并进行模糊综合评价
-    :param file_path: Excel文件路径
-    :param sheet_name: 工作表名称
-    :param indicator_cols: 指标列索引列表，如[0, 1]表示第1和第2列
-    :param thresholds: 阈值列表
-    :param method: 权重计算方法
-    :return: 评价结果字典
+    多层次模糊综合评价的节点
+    叶节点由一组指标的数据构成，用FuzzyEvaluation计算隶属度矩阵；
+    非叶节点以各子节点的综合得分作为隶属度矩阵的行，再按本节点的权重合成得分。
+    每个节点缓存隶属度矩阵、权重和得分，只有本节点的数据或权重改变时才重新计算，
+    并使上层各节点的缓存失效，兄弟节点及其子树的结果不受影响
     """
-    try:
-        import xlrd
-    except ImportError:
-        raise ImportError("需要安装xlrd库: pip install xlrd")
     
-    # 读取数据
-    data = xlrd.open_workbook(file_path)
-    table = data.sheet_by_name(sheet_name)
+    def __init__(self, name, data_matrix=None, children=None, weights=None, method='entropy',
+                 thresholds=None, levels=None):
+        """
+        :param name: 节点名称
+        :param data_matrix: 叶节点的数据矩阵，每一列代表一个评价指标
+        :param children: 非叶节点的子节点列表
+        :param weights: 本节点各指标（或各子节点）的权重，为None时按method自动计算
+        :param method: 自动计算权重的方法，叶节点同FuzzyEvaluation，非叶节点支持'entropy'，其他值为平均权重
+        :param thresholds: 叶节点的阈值列表
+        :param levels: 评价等级列表，非叶节点沿用子节点的等级
+        """
+        if (data_matrix is None) == (children is None):
+            raise ValueError("节点必须且只能给出data_matrix或children之一")
+        self.name = name
+        self.parent = None
+        self.children = children or []
+        for child in self.children:
+            child.parent = self
+        self.method = method
+        self.user_weights = weights
+        self.evaluation = None
+        if data_matrix is not None:
+            self.evaluation = FuzzyEvaluation(data_matrix, thresholds=thresholds, levels=levels)
+            self.levels = self.evaluation.levels
+        else:
+            self.levels = self.children[0].levels
+        self._membership = None
+        self._weights = None
+        self._score = None
+    
+    def invalidate(self, membership=True):
+        """
+        使本节点及所有上层节点的缓存失效
+        :param membership: 是否同时清除本节点的隶属度矩阵（只改权重时不需要）
+        """
+        if membership:
+            self._membership = None
+        self._weights = None
+        self._score = None
+        if self.parent is not None:
+            self.parent.invalidate()
+    
+    def set_weights(self, weights):
+        """
+        修改本节点的权重，为None时恢复自动计算；只需重新合成本节点及上层节点的得分
+        """
+        self.user_weights = weights
+        self.invalidate(membership=False)
+    
+    def set_data(self, data_matrix, thresholds=_KEEP_THRESHOLDS):
+        """
+        替换叶节点的数据
+        :param thresholds: 新的阈值列表，不给出时沿用原来的阈值，传入None表示不使用阈值
+        """
+        if self.evaluation is None:
+            raise ValueError("只有叶节点可以设置数据")
+        if thresholds is _KEEP_THRESHOLDS:
+            thresholds = self.evaluation.thresholds
+        self.evaluation = FuzzyEvaluation(data_matrix, thresholds=thresholds, levels=self.levels)
+        self.invalidate()
     
-    # 提取指标数据
-    data_matrix = []
-    nrows = table.nrows
+    def find(self, name):
+        """
+        在以本节点为根的子树中按名称查找节点，找不到时返回None
+        """
+        if self.name == name:
+            return self
+        for child in self.children:
+            node = child.find(name)
+            if node is not None:
+                return node
+        return None
     
-    for row_idx in range(nrows):
-        row_data = []
-        for col_idx in indicator_cols:
+    def membership(self):
+        """
+        :return: 隶属度矩阵，叶节点为各指标的隶属度，非叶节点为各子节点的得分
+        """
+        if self._membership is None:
+            if self.evaluation is not None:
+                self._membership = self.evaluation.calculate_membership()
+            else:
+                self._membership = np.array([child.score() for child in self.children])
+        return self._membership
+    
+    def weights(self):
+        """
+        :return: 本节点的权重数组
+        """
+        if self._weights is None:
+            if self.user_weights is not None:
+                self._weights = np.asarray(self.user_weights, dtype=float)
+            elif self.evaluation is not None:
+                self._weights = np.asarray(self.evaluation.compute_weights(self.method, self.membership()))
+            elif self.method == 'entropy':
+                self._weights = entropy_weights(self.membership())
+            else:
+                self._weights = np.full(len(self.children), 1 / len(self.children))  # 平均权重
+        return self._weights
+    
+    def score(self):
+        """
+        :return: 本节点的综合得分向量，长度为等级数量
+        """
+        if self._score is None:
+            self._score = self.weights() @ self.membership()
+        return self._score
+    
+    def evaluate(self):
+        """
+        :return: 本节点的综合评价结果字典，格式同FuzzyEvaluation.comprehensive_evaluation
+        """
+        return compose(self.membership(), self.weights().tolist(), self.levels)
+
+
+class LevelCounter:
+    """
+    等级计数器：分块接收数据，增量统计每个指标在各等级下的样本数，内存占用与数据总量无关
+    """
+    
+    def __init__(self, n_indicators, thresholds=None, levels=None, bounds=None):
+        """
+        :param n_indicators: 指标数量
+        :param thresholds: 阈值列表，含义同FuzzyEvaluation
+        :param levels: 评价等级列表，默认为['优', '良', '中', '差']
+        :param bounds: 每个指标的(最小值, 最大值)，没有阈值的指标按它等分，需事先给出
+        """
+        self.n_indicators = n_indicators
+        self.thresholds = thresholds
+        self.levels = levels if levels else ['优', '良', '中', '差']
+        self.n_levels = len(self.levels)
+        self.bounds = bounds
+        self.counts = np.zeros((n_indicators, self.n_levels), dtype=np.int64)  # 各指标各等级的样本数
+        self.n_samples = 0
+        
+    def update(self, chunk):
+        """
+        累加一块数据的等级计数
+        :param chunk: 数据块，形状为(n_rows, n_indicators)
+        """
+        chunk = np.asarray(chunk, dtype=float).reshape(-1, self.n_indicators)
+        for i in range(self.n_indicators):
+            if self.thresholds and i < len(self.thresholds):
+                level_idx = assign_levels(chunk[:, i], self.n_levels, threshold=self.thresholds[i])
+            else:
+                level_idx = assign_levels(chunk[:, i], self.n_levels, bounds=self.bounds[i])
+            self.counts[i] += np.bincount(level_idx, minlength=self.n_levels)
+        self.n_samples += chunk.shape[0]
+        
+    def membership(self):
+        """
+        :return: 隶属度矩阵，形状为(n_indicators, n_levels)
+        """
+        return self.counts / self.n_samples
+
+
+class RangeSketch:
+    """
+    单个指标取值分布的紧凑摘要：固定数量的等宽细分组直方图
+    新数据超出当前覆盖范围时，把相邻两组合并使覆盖范围加倍，因此不必保留历史数据，
+    最小值、最大值变化后也能按新的区间重新统计任意分组的频数
+    """
+    
+    def __init__(self, n_bins=1024):
+        """
+        :param n_bins: 细分组数量，取偶数
+        """
+        self.n_bins = n_bins + n_bins % 2
+        self.counts = np.zeros(self.n_bins)
+        self.low = None      # 覆盖范围的左端
+        self.high = None     # 覆盖范围的右端，单独保存以免由组距反算时的舍入误差
+        self.width = None    # 细分组的组距
+        self.min_val = np.inf
+        self.max_val = -np.inf
+        
+    def update(self, values):
+        """
+        加入一批取值
+        """
+        values = np.asarray(values, dtype=float)
+        if values.size == 0:
+            return
+        vmin, vmax = values.min(), values.max()
+        if self.low is None:
+            self.low = vmin
+            self.high = vmax if vmax > vmin else vmin + self.n_bins * max(abs(vmin), 1.0) * 1e-9
+            self.width = (self.high - self.low) / self.n_bins
+        # 覆盖范围为闭区间[low, high]，恰好等于右端的取值计入最后一组，首批数据正好占满全部细分组
+        while vmin < self.low or vmax > self.high:
+            merged = self.counts.reshape(-1, 2).sum(axis=1)
+            zeros = np.zeros(self.n_bins // 2)
+            span = self.high - self.low
+            if vmin < self.low:  # 向左扩展，原有数据落在右半部分
+                self.counts = np.concatenate([zeros, merged])
+                self.low -= span
+            else:
+                self.counts = np.concatenate([merged, zeros])
+                self.high += span
+            self.width *= 2
+        bin_idx = np.clip(((values - self.low) / self.width).astype(np.intp), 0, self.n_bins - 1)
+        self.counts += np.bincount(bin_idx, minlength=self.n_bins)
+        self.min_val = min(self.min_val, vmin)
+        self.max_val = max(self.max_val, vmax)
+        
+    def counts_between(self, edges):
+        """
+        估计落在各分界之间的样本数，细分组内按均匀分布线性插值
+        :param edges: 递增的分界点
+        :return: 长度为len(edges) + 1的频数数组，依次为第一个分界以下、相邻分界之间和最后一个分界以上
+        """
+        bin_edges = np.linspace(self.low, self.high, self.n_bins + 1)
+        cumulative = np.concatenate([[0.0], np.cumsum(self.counts)])
+        below = np.interp(edges, bin_edges, cumulative)
+        return np.diff(np.concatenate([[0.0], below, [cumulative[-1]]]))
+
+
+class IncrementalFuzzyEvaluation:
+    """
+    增量模糊综合评价：数据按批追加，每次只处理新增的行
+    有阈值的指标直接累加各等级的计数，结果与重新计算完全一致；
+    按区间等分的指标保留RangeSketch摘要，最小值、最大值变化后由摘要重新划分等级，
+    误差仅来自跨越等级分界的细分组
+    """
+    
+    def __init__(self, n_indicators, thresholds=None, levels=None, n_bins=1024):
+        """
+        :param n_indicators: 指标数量
+        :param thresholds: 阈值列表，含义同FuzzyEvaluation
+        :param levels: 评价等级列表，默认为['优', '良', '中', '差']
+        :param n_bins: 每个指标摘要的细分组数量，越大越精确
+        """
+        self.n_indicators = n_indicators
+        self.thresholds = thresholds
+        self.levels = levels if levels else ['优', '良', '中', '差']
+        self.n_levels = len(self.levels)
+        self.n_samples = 0
+        self.counts = np.zeros((n_indicators, self.n_levels))  # 有阈值指标的等级计数
+        self.sketches = [RangeSketch(n_bins) for i in range(n_indicators)]
+        
+    def has_threshold(self, i):
+        return bool(self.thresholds) and i < len(self.thresholds)
+        
+    def append(self, rows):
+        """
+        追加新数据
+        :param rows: 新增的数据，形状为(n_rows, n_indicators)
+        """
+        rows = np.asarray(rows, dtype=float).reshape(-1, self.n_indicators)
+        for i in range(self.n_indicators):
+            if self.has_threshold(i):
+                level_idx = assign_levels(rows[:, i], self.n_levels, threshold=self.thresholds[i])
+                self.counts[i] += np.bincount(level_idx, minlength=self.n_levels)
+            self.sketches[i].update(rows[:, i])
+        self.n_samples += rows.shape[0]
+        
+    def calculate_membership(self):
+        """
+        :return: 当前全部数据的隶属度矩阵，形状为(n_indicators, n_levels)
+        """
+        counts = self.counts.copy()
+        for i in range(self.n_indicators):
+            if not self.has_threshold(i):
+                sketch = self.sketches[i]
+                if sketch.max_val == sketch.min_val:  # 所有取值相同时与assign_levels一致，都属于第一级
+                    counts[i] = 0
+                    counts[i, 0] = self.n_samples
+                    continue
+                interval = (sketch.max_val - sketch.min_val) / self.n_levels
+                edges = sketch.min_val + interval * np.arange(1, self.n_levels)
+                counts[i] = sketch.counts_between(edges)
+        return counts / self.n_samples
+    
+    def frequency_weight(self, p=10):
+        """
+        频数统计法确定权重，分组频数由摘要估计
+        """
+        min_vals = np.array([sketch.min_val for sketch in self.sketches])
+        gaps = (np.array([sketch.max_val for sketch in self.sketches]) - min_vals) / p
+        counts = np.array([sketch.counts_between(min_vals[i] + gaps[i] * np.arange(1, p))
+                           for i, sketch in enumerate(self.sketches)])
+        return frequency_weights(counts, min_vals, gaps)
+    
+    def comprehensive_evaluation(self, weights=None, method='entropy'):
+        """
+        对目前为止追加的全部数据进行模糊综合评价
+        :param weights: 权重列表，如果为None则自动计算
+        :param method: 权重计算方法，'entropy'(熵权法)、'frequency'(频数统计法)，其他值为平均权重
+        :return: 综合评价结果字典
+        """
+        membership_matrix = self.calculate_membership()
+        if weights is None:
+            if method == 'entropy':
+                weights = entropy_weights(membership_matrix).tolist()
+            elif method == 'frequency':
+                weights = self.frequency_weight()
+            else:
+                weights = [1/self.n_indicators] * self.n_indicators  # 平均权重
+        return compose(membership_matrix, weights, self.levels)
+
+
+def read_chunks(file_path, indicator_cols, sheet_name=None, chunk_size=10000):
+    """
+    分块读取数据文件中的指标列，只保留所有指标列都是数值的行
+    支持csv（直接读取）、xlsx（openpyxl只读流式读取）和xls（xlrd）
+    :param file_path: 文件路径
+    :param indicator_cols: 指标列索引列表
+    :param sheet_name: 工作表名称，为None时取第一个工作表，csv文件忽略
+    :param chunk_size: 每块的行数
+    :return: 生成器，每次产生形状为(行数, len(indicator_cols))的浮点数组
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    
+    def numeric_rows(rows):
+        for row in rows:
             try:
-                value = table.cell_value(row_idx, col_idx)
-                if isinstance(value, (int, float)):
-                    row_data.append(value)
-            except:
+                values = [row[col] for col in indicator_cols]
+            except IndexError:
                 continue
-        if len(row_data) == len(indicator_cols):
-            data_matrix.append(row_data)
+            if all(isinstance(v, (int, float)) for v in values):
+                yield values
     
-    # 创建评价对象并进行评价
-    fuzzy_eval = FuzzyEvaluation(data_matrix, thresholds=thresholds)
-    result = fuzzy_eval.comprehensive_evaluation(method=method)
+    def csv_rows(f):
+        for row in csv.reader(f):
+            values = []
+            for col in indicator_cols:
+                try:
+                    values.append(float(row[col]))
+                except (IndexError, ValueError):
+                    break
+            else:
+                yield values
+    
+    if ext in ('.csv', '.txt'):
+        f = open(file_path, newline='', encoding='utf-8-sig')
+        close = f.close
+    elif ext in ('.xlsx', '.xlsm'):
+        try:
+            import openpyxl
+        except ImportError:
+            raise ImportError("需要安装openpyxl库: pip install openpyxl")
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        close = workbook.close
+    else:
+        try:
+            import xlrd
+        except ImportError:
+            raise ImportError("需要安装xlrd库: pip install xlrd")
+        workbook = xlrd.open_workbook(file_path, on_demand=True)
+        close = workbook.release_resources
+    
+    # 文件打开后的所有操作（包括查找工作表）都在try中，出错时也能关闭文件
+    try:
+        if ext in ('.csv', '.txt'):
+            rows = csv_rows(f)
+        elif ext in ('.xlsx', '.xlsm'):
+            sheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+            rows = numeric_rows(sheet.iter_rows(values_only=True))
+        else:
+            table = workbook.sheet_by_name(sheet_name) if sheet_name else workbook.sheet_by_index(0)
+            rows = numeric_rows(table.row_values(row_idx) for row_idx in range(table.nrows))
+        chunk = []
+        for values in rows:
+            chunk.append(values)
+            if len(chunk) == chunk_size:
+                yield np.array(chunk, dtype=float)
+                chunk = []
+        if chunk:
+            yield np.array(chunk, dtype=float)
+    finally:
+        close()
+
+
+def fuzzy_evaluate_from_file(file_path, indicator_cols, sheet_name=None, thresholds=None, levels=None,
+                             method='entropy', chunk_size=10000, p=10):
+    """
+    流式读取数据文件并进行模糊综合评价，不需要把整张表读入内存
+    有指标需要按区间等分时，先扫描一遍文件得到各指标的最小值和最大值，再扫描一遍统计等级
+    :param file_path: 数据文件路径，支持csv、xlsx、xls
+    :param indicator_cols: 指标列索引列表
+    :param sheet_name: 工作表名称
+    :param thresholds: 阈值列表
+    :param levels: 评价等级列表
+    :param method: 权重计算方法，'entropy'(熵权法)、'frequency'(频数统计法)，其他值为平均权重
+    :param chunk_size: 每块的行数
+    :param p: 频数统计法的分组数
+    :return: 评价结果字典
+    """
+    n_indicators = len(indicator_cols)
+    
+    # 第一遍：没有阈值的指标和频数统计法需要全局最小值和最大值
+    bounds = None
+    if not thresholds or len(thresholds) < n_indicators or method == 'frequency':
+        min_vals = np.full(n_indicators, np.inf)
+        max_vals = np.full(n_indicators, -np.inf)
+        for chunk in read_chunks(file_path, indicator_cols, sheet_name, chunk_size):
+            np.minimum(min_vals, chunk.min(axis=0), out=min_vals)
+            np.maximum(max_vals, chunk.max(axis=0), out=max_vals)
+        bounds = list(zip(min_vals, max_vals))
+    
+    # 第二遍：增量统计各等级的样本数，频数统计法同时统计分组频数
+    counter = LevelCounter(n_indicators, thresholds=thresholds, levels=levels, bounds=bounds)
+    if method == 'frequency':
+        gaps = (max_vals - min_vals) / p
+        counts = np.zeros((n_indicators, p), dtype=np.int64)
+    for chunk in read_chunks(file_path, indicator_cols, sheet_name, chunk_size):
+        counter.update(chunk)
+        if method == 'frequency':
+            counts += frequency_counts(chunk, min_vals, gaps, p)
     
-    return result
+    membership_matrix = counter.membership()
+    if method == 'entropy':
+        weights = entropy_weights(membership_matrix).tolist()
+    elif method == 'frequency':
+        weights = frequency_weights(counts, min_vals, gaps)
+    else:
+        weights = [1 / n_indicators] * n_indicators  # 平均权重
+    return compose(membership_matrix, weights, counter.levels)
+
+
+def fuzzy_evaluate_from_excel(file_path, sheet_name, indicator_cols, thresholds=None, method='entropy'):
+    """
+    从Excel文件读取数据并进行模糊综合评价（分块流式读取，见fuzzy_evaluate_from_file）
+    :param file_path: Excel文件路径
+    :param sheet_name: 工作表名称
+    :param indicator_cols: 指标列索引列表，如[0, 1]表示第1和第2列
+    :param thresholds: 阈值列表
+    :param method: 权重计算方法
+    :return: 评价结果字典
+    """
+    return fuzzy_evaluate_from_file(file_path, indicator_cols, sheet_name=sheet_name, thresholds=thresholds,
+                                    method=method)
+
+
+if __name__ == '__main__':
+    # 自检：按分界硬划分（width=0）时，逐样本得分的平均值应与comprehensive_evaluation的结果一致
+    rng = np.random.default_rng(0)
+    for data, thresholds in ((rng.integers(0, 5, (1000, 3)).astype(float), None),
+                             (rng.normal(0, 1, (1000, 2)), [[1, 0, -1], [-0.5, 0, 0.5]])):
+        fuzzy_eval = FuzzyEvaluation(data, thresholds=thresholds)
+        mean_scores = fuzzy_eval.sample_scores(width=0)[0].mean(axis=0)
+        expected = fuzzy_eval.comprehensive_evaluation()['scores']
+        assert np.allclose(mean_scores, expected), (mean_scores, expected)
+        print("逐样本得分的平均值：", mean_scores, "综合评价得分：", expected)
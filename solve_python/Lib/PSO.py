@@ -1,14 +1,120 @@
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+
 def fit_fun(x):  # 适应函数
     return sum(100.0 * (x[0][1:] - x[0][:-1] ** 2.0) ** 2.0 + (1 - x[0][:-1]) ** 2.0)
 
 
+def batch_fit_fun(x):  # 批量适应函数，x 形状为 (size, dim)，返回 (size,)
+    return np.sum(100.0 * (x[:, 1:] - x[:, :-1] ** 2.0) ** 2.0 + (1 - x[:, :-1]) ** 2.0, axis=1)
+
+
+class Objective:
+    """
+    目标函数包装，统一为批量形式：输入 (size, dim) 的种群，返回每个粒子的适应值
+    :param fit_func: 目标函数，为 None 时使用内置的 Rosenbrock 函数
+    :param batch: True 表示 fit_func 直接接收整个种群并返回适应值向量，
+                  False 表示 fit_func 与 fit_fun 相同，每次只接收一个 (1, dim) 的粒子
+    """
+
+    def __init__(self, fit_func=None, batch=False):
+        if fit_func is None:
+            fit_func, batch = batch_fit_fun, True
+        self.fit_func = fit_func
+        self.batch = batch
+
+    def __call__(self, x):
+        if self.batch:
+            return np.asarray(self.fit_func(x), dtype=float)
+        return np.array([self.fit_func(x[k:k + 1]) for k in range(x.shape[0])], dtype=float)
+
+
+def evaluate_population(objective, pos, executor=None, chunk_size=None):
+    """
+    计算整个种群的适应值
+    :param objective: Objective 对象，使用进程池时目标函数必须能被 pickle（模块级函数）
+    :param pos: 种群位置，形状为 (size, dim)
+    :param executor: concurrent.futures 的执行器，为 None 时在当前进程中计算
+    :param chunk_size: 每个任务包含的粒子数，默认把种群分成进程数 4 倍的块
+    :return: 适应值数组，顺序与 pos 的行一致
+    """
+    if executor is None:
+        return objective(pos)
+    if chunk_size is None:
+        workers = getattr(executor, '_max_workers', None) or os.cpu_count() or 1
+        chunk_size = max(1, -(-pos.shape[0] // (4 * workers)))
+    chunks = [pos[k:k + chunk_size] for k in range(0, pos.shape[0], chunk_size)]
+    # map 按提交顺序返回结果，个体最优、种群最优的更新顺序与串行计算相同
+    return np.concatenate(list(executor.map(objective, chunks)))
+
+
+# metrics 数组各列的含义：最优适应值、种群多样性（粒子到质心的平均距离）、平均速度范数、已用时间（秒）
+# 多样性和速度范数只在迭代序号为 metrics_every 的倍数时计算，其余迭代为 nan
+METRIC_NAMES = ('best_fitness', 'diversity', 'vel_norm', 'wall_time')
+
+
+def print_progress(pso, i):
+    """打印每次迭代最优适应值的回调函数"""
+    print('第{}次最佳适应值为{}'.format(i, pso.get_bestFitnessValue()))
+
+
+def metrics_due(pso, i):
+    """第 i 次迭代是否需要计算多样性和速度范数"""
+    every = getattr(pso, 'metrics_every', 1)
+    return every is not None and i % every == 0
+
+
+def record_metrics(pso, i, pos, vel, start, improvement=None):
+    """
+    记录第 i 次迭代的指标并判断是否停止迭代
+    :param pso: 粒子群对象，需要有 metrics、fitness_val_list、stall、tol、patience、min_delta、callback 属性，
+                可选的 metrics_every（默认 1，为 None 时不计算多样性和速度范数）和 _buf（与 pos 同形的临时数组）
+    :param pos: 当前种群位置，形状为 (size, dim)；metrics_due 为 False 时可传入 None
+    :param vel: 当前种群速度，形状为 (size, dim)；metrics_due 为 False 时可传入 None
+    :param start: 计时起点（time.perf_counter 的值）
+    :param improvement: 本次迭代的改进量，不大于 min_delta 时记为停滞；默认为最优适应值的下降量
+    :return: 达到截至条件、连续 patience 次迭代改进不超过 min_delta 或回调函数返回 True 时返回 True
+    """
+    if pso.metrics.shape[0] <= i:  # 迭代次数增加（如恢复或岛屿模型）时扩充记录数组
+        extra = np.full((max(i + 1, pso.iter_num) - pso.metrics.shape[0], len(METRIC_NAMES)), np.nan)
+        pso.metrics = np.vstack([pso.metrics, extra])
+    best = pso.get_bestFitnessValue()
+    if improvement is None:
+        prev = pso.fitness_val_list[-1] if pso.fitness_val_list else float('Inf')
+        improvement = prev - best
+    pso.stall = 0 if improvement > pso.min_delta else pso.stall + 1
+    row = pso.metrics[i]
+    row[0] = best
+    if pos is not None and metrics_due(pso, i):
+        buf = getattr(pso, '_buf', None)
+        if buf is None or buf.shape != pos.shape:
+            buf = np.empty(pos.shape)
+        np.subtract(pos, pos.mean(axis=0), out=buf)
+        row[1] = np.mean(np.sqrt(np.einsum('ij,ij->i', buf, buf)))
+        row[2] = np.mean(np.sqrt(np.einsum('ij,ij->i', vel, vel)))
+    row[3] = time.perf_counter() - start
+    pso.fitness_val_list.append(best)  # 每次迭代完把当前的最优适应度存到列表
+    stop = best < pso.tol or (pso.patience is not None and pso.stall >= pso.patience)
+    if pso.callback is not None and pso.callback(pso, i):
+        stop = True
+    return stop
+
+
 class Particle:
     # 初始化
-    def __init__(self, x_max, max_vel, dim):
+    def __init__(self, x_max, max_vel, dim, fit_func=fit_fun):
         self.__pos = np.random.uniform(-x_max, x_max, (1, dim))  # 粒子的位置
         self.__vel = np.random.uniform(-max_vel, max_vel, (1, dim))  # 粒子的速度
         self.__bestPos = np.zeros((1, dim))  # 粒子最好的位置
-        self.__fitnessValue = fit_fun(self.__pos)  # 适应度函数值
+        # 适应度函数值，fit_func 为 None 时由种群统一批量计算后再设置
+        self.__fitnessValue = fit_func(self.__pos) if fit_func is not None else float('Inf')
 
     def set_pos(self, value):
         self.__pos = value
@@ -36,7 +142,23 @@ class Particle:
 
 
 class PSO:
-    def __init__(self, dim, size, iter_num, x_max, max_vel, tol, best_fitness_value=float('Inf'), C1=2, C2=2, W=1):
+    """
+    粒子群算法
+    :param fit_func: 目标函数，默认为 fit_fun
+    :param batch: 为 True 时 fit_func 接收整个 (size, dim) 种群并返回适应值向量，
+                  每次迭代先移动全部粒子再统一计算一次适应值
+    :param executor: concurrent.futures 执行器（如 ProcessPoolExecutor），给定时按批量方式迭代，
+                     每次迭代的适应值分块并行计算
+    :param chunk_size: 并行计算时每块的粒子数
+    :param callback: 每次迭代后调用 callback(pso, i)，返回 True 时停止迭代，如 print_progress
+    :param patience: 连续 patience 次迭代最优适应值的改进都不超过 min_delta 时提前停止，为 None 时不启用
+    :param min_delta: 判断停滞时认为有改进的最小下降量
+    :param metrics_every: 每隔多少次迭代记录一次多样性和速度范数，为 None 时不记录
+    """
+
+    def __init__(self, dim, size, iter_num, x_max, max_vel, tol, best_fitness_value=float('Inf'), C1=2, C2=2, W=1,
+                 fit_func=None, batch=False, executor=None, chunk_size=None, callback=None, patience=None,
+                 min_delta=0.0, metrics_every=1):
         self.C1 = C1
         self.C2 = C2
         self.W = W
@@ -49,9 +171,27 @@ class PSO:
         self.best_fitness_value = best_fitness_value
         self.best_position = np.zeros((1, dim))  # 种群最优位置
         self.fitness_val_list = []  # 每次迭代最优适应值
+        self.metrics = np.full((iter_num, len(METRIC_NAMES)), np.nan)  # 每次迭代的指标，列见 METRIC_NAMES
+        self.callback = callback
+        self.patience = patience
+        self.min_delta = min_delta
+        self.metrics_every = metrics_every
+        self.stall = 0  # 连续没有改进的迭代次数
+        self.batch = batch or executor is not None
+        self.fit_func = fit_fun if fit_func is None else fit_func  # 单个粒子的目标函数
+        self.objective = Objective(fit_func, batch)  # 批量目标函数
+        self.executor = executor
+        self.chunk_size = chunk_size
 
         # 对种群进行初始化
-        self.Particle_list = [Particle(self.x_max, self.max_vel, self.dim) for i in range(self.size)]
+        if self.batch:
+            self.Particle_list = [Particle(self.x_max, self.max_vel, self.dim, None) for i in range(self.size)]
+            values = self.evaluate(np.vstack([part.get_pos() for part in self.Particle_list]))
+            for part, value in zip(self.Particle_list, values):
+                part.set_fitness_value(value)
+                part.set_best_pos(part.get_pos())
+        else:
+            self.Particle_list = [Particle(self.x_max, self.max_vel, self.dim, self.fit_func) for i in range(self.size)]
 
     def set_bestFitnessValue(self, value):
         self.best_fitness_value = value
@@ -65,6 +205,10 @@ class PSO:
     def get_bestPosition(self):
         return self.best_position
 
+    # 批量计算种群适应值
+    def evaluate(self, pos):
+        return evaluate_population(self.objective, pos, self.executor, self.chunk_size)
+
     # 更新速度
     def update_vel(self, part):
         vel_value = self.W * part.get_vel() + self.C1 * np.random.rand() * (part.get_best_pos() - part.get_pos()) \
@@ -77,7 +221,11 @@ class PSO:
     def update_pos(self, part):
         pos_value = part.get_pos() + part.get_vel()
         part.set_pos(pos_value)
-        value = fit_fun(part.get_pos())
+        self.update_best(part, self.fit_func(pos_value))
+
+    # 根据新的适应值更新个体最优和种群最优
+    def update_best(self, part, value):
+        pos_value = part.get_pos()
         if value < part.get_fitness_value():
             part.set_fitness_value(value)
             part.set_best_pos(pos_value)
@@ -87,13 +235,569 @@ class PSO:
 
     def update_ndim(self):
 
+        start = time.perf_counter()
         for i in range(self.iter_num):
-            for part in self.Particle_list:
-                self.update_vel(part)  # 更新速度
-                self.update_pos(part)  # 更新位置
-            self.fitness_val_list.append(self.get_bestFitnessValue())  # 每次迭代完把当前的最优适应度存到列表
-            print('第{}次最佳适应值为{}'.format(i, self.get_bestFitnessValue()))
-            if self.get_bestFitnessValue() < self.tol:
+            if self.batch:
+                for part in self.Particle_list:
+                    self.update_vel(part)  # 更新速度
+                    part.set_pos(part.get_pos() + part.get_vel())  # 更新位置
+                values = self.evaluate(np.vstack([part.get_pos() for part in self.Particle_list]))
+                for part, value in zip(self.Particle_list, values):
+                    self.update_best(part, value)
+            else:
+                for part in self.Particle_list:
+                    self.update_vel(part)  # 更新速度
+                    self.update_pos(part)  # 更新位置
+            pos = vel = None  # 只在需要记录多样性和速度范数的迭代中拼接
+            if metrics_due(self, i):
+                pos = np.vstack([part.get_pos() for part in self.Particle_list])
+                vel = np.vstack([part.get_vel() for part in self.Particle_list])
+            if record_metrics(self, i, pos, vel, start):
+                break
+
+        return self.fitness_val_list, self.get_bestPosition()
+
+
+class SwarmPSO:
+    """
+    向量化粒子群
+    位置、速度、个体最优位置和个体最优适应值都保存在 (size, dim) 的数组中，
+    一次迭代只需几次整体的数组运算，适合粒子数多、维度高的情况
+    :param fit_func: 目标函数，为 None 时使用批量的 Rosenbrock 函数
+    :param batch: 为 True 时 fit_func 接收整个 (size, dim) 种群并返回适应值向量，否则逐个粒子调用
+    :param executor: concurrent.futures 执行器，给定时每次迭代的适应值分块并行计算
+    :param chunk_size: 并行计算时每块的粒子数
+    :param seed: 随机数种子，随机数只在主进程中产生，给定种子时结果与是否并行无关
+    :param checkpoint_path: 检查点文件路径（.npz），给定时每 checkpoint_every 次迭代保存一次，
+                            中断后可用 SwarmPSO.resume 从该文件继续
+    :param checkpoint_every: 保存检查点的迭代间隔
+    :param callback: 每次迭代后调用 callback(pso, i)，返回 True 时停止迭代，如 print_progress
+    :param patience: 连续 patience 次迭代最优适应值的改进都不超过 min_delta 时提前停止，为 None 时不启用
+    :param min_delta: 判断停滞时认为有改进的最小下降量
+    :param metrics_every: 每隔多少次迭代记录一次多样性和速度范数，为 None 时不记录
+    """
+
+    def __init__(self, dim, size, iter_num, x_max, max_vel, tol, best_fitness_value=float('Inf'), C1=2, C2=2, W=1,
+                 fit_func=None, batch=False, executor=None, chunk_size=None, seed=None, checkpoint_path=None,
+                 checkpoint_every=10, callback=None, patience=None, min_delta=0.0, metrics_every=1):
+        self.C1 = C1
+        self.C2 = C2
+        self.W = W
+        self.dim = dim  # 粒子的维度
+        self.size = size  # 粒子个数
+        self.iter_num = iter_num  # 迭代次数
+        self.x_max = x_max
+        self.max_vel = max_vel  # 粒子最大速度
+        self.tol = tol  # 截至条件
+        self.best_fitness_value = best_fitness_value
+        self.best_position = np.zeros((1, dim))  # 种群最优位置
+        self.fitness_val_list = []  # 每次迭代最优适应值
+        self.metrics = np.full((iter_num, len(METRIC_NAMES)), np.nan)  # 每次迭代的指标，列见 METRIC_NAMES
+        self.callback = callback
+        self.patience = patience
+        self.min_delta = min_delta
+        self.metrics_every = metrics_every
+        self.stall = 0  # 连续没有改进的迭代次数
+        self.objective = Objective(fit_func, batch)
+        self.executor = executor
+        self.chunk_size = chunk_size
+        self.rng = np.random.default_rng(seed)  # 独立的随机数发生器，便于复现
+        self.iter = 0  # 已完成的迭代次数
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+
+        # 对种群进行初始化
+        self.pos = self.rng.uniform(-x_max, x_max, (size, dim))  # 粒子的位置
+        self.vel = self.rng.uniform(-max_vel, max_vel, (size, dim))  # 粒子的速度
+        self.best_pos = self.pos.copy()  # 粒子最好的位置
+        self.fitness = self.evaluate(self.pos)  # 粒子最好的适应度函数值
+        self._buf = np.empty((size, dim))  # 速度更新用的临时数组，避免每次迭代重新分配
+        self.update_best()
+
+    def set_bestFitnessValue(self, value):
+        self.best_fitness_value = value
+
+    def get_bestFitnessValue(self):
+        return self.best_fitness_value
+
+    def set_bestPosition(self, value):
+        self.best_position = value
+
+    def get_bestPosition(self):
+        return self.best_position
+
+    # 保存检查点：种群状态、迭代记录和随机数发生器状态
+    def save_checkpoint(self, path=None):
+        path = self.checkpoint_path if path is None else path
+        params = np.array([self.dim, self.size, self.iter_num, self.x_max, self.max_vel, self.tol,
+                           self.C1, self.C2, self.W, self.iter, self.stall], dtype=float)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, params=params, pos=self.pos, vel=self.vel, best_pos=self.best_pos, fitness=self.fitness,
+                     best_position=self.best_position, best_fitness_value=self.best_fitness_value,
+                     fitness_val_list=np.array(self.fitness_val_list, dtype=float), metrics=self.metrics,
+                     rng_state=np.array(json.dumps(self.rng.bit_generator.state)), **self.checkpoint_state())
+        os.replace(tmp_path, path)  # 写完后再替换，避免中断时留下损坏的检查点
+
+    # 子类需要额外保存到检查点中的数组
+    def checkpoint_state(self):
+        return {}
+
+    # 从检查点读出 checkpoint_state 保存的数组
+    def restore_state(self, data):
+        pass
+
+    @classmethod
+    def resume(cls, path, fit_func=None, batch=False, executor=None, chunk_size=None, iter_num=None,
+               checkpoint_every=10, callback=None, patience=None, min_delta=0.0, metrics_every=1):
+        """
+        从检查点恢复粒子群，之后调用 update_ndim 会从中断处继续迭代
+        :param path: save_checkpoint 写出的检查点文件，之后的检查点仍写入该文件
+        :param fit_func: 目标函数，需与中断前相同（函数本身不保存在检查点中）
+        :param iter_num: 新的总迭代次数，为 None 时沿用检查点中的值
+        :return: 恢复后的粒子群对象
+        """
+        with np.load(path) as data:
+            dim, size, saved_iter_num, x_max, max_vel, tol, C1, C2, W, it, stall = data['params'].tolist()
+            pso = cls.__new__(cls)
+            pso.C1, pso.C2, pso.W = C1, C2, W
+            pso.dim, pso.size = int(dim), int(size)
+            pso.iter_num = int(saved_iter_num) if iter_num is None else iter_num
+            pso.x_max, pso.max_vel, pso.tol = x_max, max_vel, tol
+            pso.best_fitness_value = float(data['best_fitness_value'])
+            pso.best_position = data['best_position']
+            pso.fitness_val_list = data['fitness_val_list'].tolist()
+            pso.metrics = data['metrics']
+            pso.pos, pso.vel = data['pos'], data['vel']
+            pso.best_pos, pso.fitness = data['best_pos'], data['fitness']
+            pso.rng = np.random.default_rng()
+            pso.rng.bit_generator.state = json.loads(str(data['rng_state']))
+            pso.restore_state(data)
+        pso.objective = Objective(fit_func, batch)
+        pso.executor = executor
+        pso.chunk_size = chunk_size
+        pso.iter = int(it)
+        pso.stall = int(stall)
+        pso.callback = callback
+        pso.patience = patience
+        pso.min_delta = min_delta
+        pso.metrics_every = metrics_every
+        pso.checkpoint_path = path
+        pso.checkpoint_every = checkpoint_every
+        pso._buf = np.empty((pso.size, pso.dim))
+        return pso
+
+    # 计算整个种群的适应值
+    def evaluate(self, pos):
+        return evaluate_population(self.objective, pos, self.executor, self.chunk_size)
+
+    # 社会学习项追随的位置，单目标时为种群最优位置
+    def guide(self):
+        return self.best_position
+
+    # 更新速度，每个粒子对两个学习项各取一个随机系数，与 PSO.update_vel 一致
+    def update_vel(self):
+        r1 = self.rng.random((self.size, 1))
+        r2 = self.rng.random((self.size, 1))
+        self.vel *= self.W
+        np.subtract(self.best_pos, self.pos, out=self._buf)
+        self._buf *= self.C1 * r1
+        self.vel += self._buf
+        np.subtract(self.guide(), self.pos, out=self._buf)
+        self._buf *= self.C2 * r2
+        self.vel += self._buf
+        np.clip(self.vel, -self.max_vel, self.max_vel, out=self.vel)
+
+    # 更新位置以及个体最优
+    def update_pos(self):
+        self.pos += self.vel
+        value = self.evaluate(self.pos)
+        improved = value < self.fitness
+        self.fitness[improved] = value[improved]
+        self.best_pos[improved] = self.pos[improved]
+        self.update_best()
+
+    # 接收迁移来的粒子，替换当前个体最优最差的若干粒子
+    def migrate(self, positions, values):
+        worst = np.argsort(self.fitness)[-len(values):]
+        self.pos[worst] = positions
+        self.best_pos[worst] = positions
+        self.fitness[worst] = values
+        self.update_best()
+
+    # 取个体最优最好的 n 个粒子作为迁出粒子
+    def emigrants(self, n):
+        best = np.argsort(self.fitness)[:n]
+        return self.best_pos[best].copy(), self.fitness[best].copy()
+
+    # 更新种群最优
+    def update_best(self):
+        idx = np.argmin(self.fitness)
+        if self.fitness[idx] < self.get_bestFitnessValue():
+            self.set_bestFitnessValue(self.fitness[idx])
+            self.set_bestPosition(self.best_pos[idx:idx + 1].copy())
+
+    def update_ndim(self):
+
+        # 从检查点恢复时接着之前的用时继续计时
+        start = time.perf_counter() - (self.metrics[self.iter - 1, 3] if self.iter > 0 else 0.0)
+        while self.iter < self.iter_num:
+            self.update_vel()  # 更新速度
+            self.update_pos()  # 更新位置
+            self.iter += 1
+            if record_metrics(self, self.iter - 1, self.pos, self.vel, start):
+                break
+            if self.checkpoint_path is not None and self.iter % self.checkpoint_every == 0:
+                self.save_checkpoint()
+        if self.checkpoint_path is not None:
+            self.save_checkpoint()
+
+        return self.fitness_val_list, self.get_bestPosition()
+
+
+def _island_worker(conn, args, kwargs):
+    """岛屿子进程：按主进程的指令运行若干次迭代，并收发迁移粒子"""
+    try:
+        pso = SwarmPSO(*args, **kwargs)
+        n_migrants = conn.recv()
+        while True:
+            msg = conn.recv()
+            if msg is None:
                 break
+            n_iter, migrants = msg
+            if migrants is not None:
+                pso.migrate(*migrants)
+            done = len(pso.fitness_val_list)
+            pso.iter_num = pso.iter + n_iter
+            pso.update_ndim()
+            conn.send(('ok', pso.fitness_val_list[done:], pso.emigrants(n_migrants), pso.get_bestPosition()))
+    except Exception:
+        conn.send(('error', traceback.format_exc()))
+    finally:
+        conn.close()
+
+
+class IslandPSO:
+    """
+    多种群（岛屿模型）粒子群
+    n_islands 个子种群分别在独立进程中运行 SwarmPSO，每隔 migrate_every 次迭代，
+    各岛把个体最优最好的 n_migrants 个粒子经管道发送给环上的下一个岛，替换其中最差的粒子
+    :param size: 每个岛的粒子个数
+    :param seed: 随机数种子，各岛使用由它派生的独立种子
+    :param kwargs: 传给 SwarmPSO 的其他参数，如 fit_func、batch、C1、C2、W，目标函数需能被 pickle
+    """
+
+    def __init__(self, dim, size, iter_num, x_max, max_vel, tol, n_islands=4, migrate_every=10, n_migrants=1,
+                 seed=None, **kwargs):
+        self.dim = dim
+        self.size = size
+        self.iter_num = iter_num
+        self.x_max = x_max
+        self.max_vel = max_vel
+        self.tol = tol
+        self.n_islands = n_islands
+        self.migrate_every = migrate_every
+        self.n_migrants = n_migrants
+        self.seed = seed
+        self.kwargs = kwargs
+        self.best_fitness_value = float('Inf')
+        self.best_position = np.zeros((1, dim))  # 所有岛的最优位置
+        self.fitness_val_list = []  # 每次迭代所有岛中的最优适应值
+
+    def get_bestFitnessValue(self):
+        return self.best_fitness_value
+
+    def get_bestPosition(self):
+        return self.best_position
+
+    def update_ndim(self):
+
+        seeds = np.random.SeedSequence(self.seed).spawn(self.n_islands)
+        args = (self.dim, self.size, 0, self.x_max, self.max_vel, self.tol)
+        conns, procs = [], []
+        try:
+            for k in range(self.n_islands):
+                parent_conn, child_conn = multiprocessing.Pipe()
+                proc = multiprocessing.Process(target=_island_worker,
+                                               args=(child_conn, args, dict(self.kwargs, seed=seeds[k])))
+                proc.start()
+                child_conn.close()
+                parent_conn.send(self.n_migrants)
+                conns.append(parent_conn)
+                procs.append(proc)
+
+            migrants = [None] * self.n_islands
+            finished = 0
+            while finished < self.iter_num:
+                n_iter = min(self.migrate_every, self.iter_num - finished)
+                for conn, m in zip(conns, migrants):
+                    conn.send((n_iter, m))
+                replies = [conn.recv() for conn in conns]
+                for reply in replies:
+                    if reply[0] == 'error':
+                        raise RuntimeError('岛屿子进程出错：\n' + reply[1])
+                # 合并各岛本轮的迭代记录，提前达到截至条件的岛用最后的值补齐
+                histories = [reply[1] for reply in replies]
+                length = max(len(h) for h in histories)
+                histories = [h + h[-1:] * (length - len(h)) for h in histories]
+                self.fitness_val_list.extend(np.min(histories, axis=0).tolist())
+                for reply in replies:
+                    values = reply[2][1]
+                    if len(values) and values[0] < self.best_fitness_value:
+                        self.best_fitness_value = float(values[0])
+                        self.best_position = reply[3]
+                finished += n_iter
+                if self.best_fitness_value < self.tol:
+                    break
+                # 环形拓扑：第 k 个岛接收第 k - 1 个岛的迁出粒子
+                migrants = [replies[k - 1][2] for k in range(self.n_islands)]
+        finally:
+            for conn in conns:
+                try:
+                    conn.send(None)
+                except (BrokenPipeError, OSError):
+                    pass
+            for proc in procs:
+                proc.join()
 
         return self.fitness_val_list, self.get_bestPosition()
+
+
+class AsyncPSO(SwarmPSO):
+    """
+    异步（稳态）粒子群
+    每个粒子的适应值一返回，就用当前的种群最优更新它的速度和位置并立即重新提交，
+    不必等待同一次迭代中最慢的粒子，适合目标函数耗时差异大的情况。
+    总评价次数为 iter_num * size，每完成 size 次评价记为一次迭代；
+    结果依赖于任务完成的先后顺序，因此即使给定种子也不保证可复现。
+    executor 为 None 时在构造时创建一个 ProcessPoolExecutor，初始种群也在其中并行评价，update_ndim 结束后关闭
+    """
+
+    def __init__(self, dim, size, iter_num, x_max, max_vel, tol, best_fitness_value=float('Inf'), C1=2, C2=2, W=1,
+                 fit_func=None, batch=False, executor=None, chunk_size=None, seed=None, checkpoint_path=None,
+                 checkpoint_every=10, callback=None, patience=None, min_delta=0.0, metrics_every=1):
+        self._pool = None
+        if executor is None:
+            self._pool = executor = ProcessPoolExecutor()
+        try:
+            super().__init__(dim, size, iter_num, x_max, max_vel, tol, best_fitness_value, C1, C2, W, fit_func, batch,
+                             executor, chunk_size, seed, checkpoint_path, checkpoint_every, callback, patience,
+                             min_delta, metrics_every)
+        except BaseException:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    # 更新第 k 个粒子的速度和位置
+    def move(self, k):
+        r1, r2 = self.rng.random(2)
+        vel_value = self.W * self.vel[k] + self.C1 * r1 * (self.best_pos[k] - self.pos[k]) \
+                    + self.C2 * r2 * (self.best_position[0] - self.pos[k])
+        np.clip(vel_value, -self.max_vel, self.max_vel, out=self.vel[k])
+        self.pos[k] += self.vel[k]
+
+    def update_ndim(self):
+
+        executor = self.executor if self.executor is not None else ProcessPoolExecutor()
+        own = executor is not self.executor or executor is getattr(self, '_pool', None)
+        start = time.perf_counter()
+        budget = self.iter_num * self.size  # 总评价次数
+        submitted, finished, stop = 0, 0, False
+        running = {}
+        try:
+            # 先让所有粒子各自移动一步并提交，使进程池保持饱和
+            for k in range(self.size):
+                self.move(k)
+                running[executor.submit(self.objective, self.pos[k:k + 1].copy())] = k
+                submitted += 1
+            while running and not stop:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    k = running.pop(future)
+                    value = future.result()[0]
+                    finished += 1
+                    if value < self.fitness[k]:
+                        self.fitness[k] = value
+                        self.best_pos[k] = self.pos[k]
+                    if value < self.get_bestFitnessValue():
+                        self.set_bestFitnessValue(value)
+                        self.set_bestPosition(self.pos[k:k + 1].copy())
+                    if stop:
+                        continue
+                    if finished % self.size == 0:
+                        stop = record_metrics(self, len(self.fitness_val_list), self.pos, self.vel, start)
+                    elif self.get_bestFitnessValue() < self.tol:  # 记录达到截至条件时的状态
+                        stop = record_metrics(self, len(self.fitness_val_list), self.pos, self.vel, start)
+                    if not stop and submitted < budget:
+                        self.move(k)
+                        running[executor.submit(self.objective, self.pos[k:k + 1].copy())] = k
+                        submitted += 1
+        finally:
+            for future in running:
+                future.cancel()
+            if own:
+                executor.shutdown(wait=False, cancel_futures=True)
+                if executor is self.executor:
+                    self.executor = self._pool = None
+
+        return self.fitness_val_list, self.get_bestPosition()
+
+
+def time_to_target(pso, target):
+    """
+    达到目标适应值所用的时间
+    :param pso: 已运行 update_ndim 的 PSO、SwarmPSO 或 AsyncPSO
+    :param target: 目标适应值
+    :return: 最优适应值首次不大于 target 时已用的秒数，未达到则返回 None
+    """
+    if isinstance(pso, MOPSO):
+        raise TypeError("多目标粒子群没有单一的最优适应值，不能计算 time_to_target")
+    reached = np.flatnonzero(pso.metrics[:, 0] <= target)
+    return float(pso.metrics[reached[0], 3]) if len(reached) else None
+
+
+def benchmark_async(target, executor, dim, size, iter_num, x_max, max_vel, fit_func=None, seed=None, **kwargs):
+    """
+    在同一个执行器上比较同步与异步粒子群达到目标适应值所用的时间
+    :param target: 目标适应值，同时作为两种模式的截至条件
+    :param executor: 两种模式共用的执行器
+    :return: 字典，键为 'sync' 和 'async'，值为 time_to_target 的结果
+    """
+    result = {}
+    for name, cls in (('sync', SwarmPSO), ('async', AsyncPSO)):
+        pso = cls(dim, size, iter_num, x_max, max_vel, target, fit_func=fit_func, executor=executor, chunk_size=1,
+                  seed=seed, **kwargs)
+        pso.update_ndim()
+        result[name] = time_to_target(pso, target)
+    return result
+
+
+def non_dominated(F, chunk_size=1024):
+    """
+    非支配解判断（各目标均为最小化）
+    :param F: 目标值矩阵，形状为 (n, n_obj)
+    :param chunk_size: 每次参与比较的行数，比较时占用 chunk_size * n * n_obj 的布尔数组
+    :return: 布尔数组，True 表示该行不被其他任何行支配
+    """
+    mask = np.ones(F.shape[0], dtype=bool)
+    for k in range(0, F.shape[0], chunk_size):
+        block = F[k:k + chunk_size, None, :]
+        dominated = np.all(F <= block, axis=2) & np.any(F < block, axis=2)
+        mask[k:k + chunk_size] = ~np.any(dominated, axis=1)
+    return mask
+
+
+def crowding_distance(F):
+    """
+    拥挤距离
+    :param F: 目标值矩阵，形状为 (n, n_obj)
+    :return: 每行的拥挤距离，各目标上的边界解为 inf
+    """
+    n = F.shape[0]
+    if n <= 2:
+        return np.full(n, float('Inf'))
+    order = np.argsort(F, axis=0)
+    sorted_F = np.take_along_axis(F, order, axis=0)
+    span = sorted_F[-1] - sorted_F[0]
+    span[span == 0] = 1.0
+    gap = np.empty_like(sorted_F)
+    gap[1:-1] = (sorted_F[2:] - sorted_F[:-2]) / span
+    gap[[0, -1]] = float('Inf')
+    distance = np.zeros_like(sorted_F)
+    np.put_along_axis(distance, order, gap, axis=0)
+    return distance.sum(axis=1)
+
+
+class MOPSO(SwarmPSO):
+    """
+    多目标粒子群
+    目标函数返回 (size, n_obj) 的目标值矩阵，各目标均为最小化。
+    外部档案保存迄今为止的非支配解，超过 archive_size 时按拥挤距离保留分布最分散的解；
+    每个粒子的社会学习项从档案中按拥挤距离二元锦标赛选取引导者
+    :param fit_func: 多目标函数，batch 为 False 时每次接收 (1, dim) 的粒子并返回长度为 n_obj 的向量
+    :param archive_size: 档案的最大容量
+    :param patience: 连续 patience 次迭代新进入档案的解都不超过 min_delta 个时提前停止，为 None 时不启用
+    其余参数与 SwarmPSO 相同；没有单一的最优适应值，metrics 的 best_fitness 列为 nan，
+    检查点中同时保存档案
+    """
+
+    def __init__(self, dim, size, iter_num, x_max, max_vel, fit_func, archive_size=100, C1=1.5, C2=1.5, W=0.5,
+                 batch=False, executor=None, chunk_size=None, seed=None, checkpoint_path=None, checkpoint_every=10,
+                 callback=None, patience=None, min_delta=0.0, metrics_every=1):
+        self.archive_size = archive_size
+        self.archive_pos = np.empty((0, dim))  # 档案中解的位置
+        self.archive_fit = None  # 档案中解的目标值
+        self.archive_cd = None  # 档案中解的拥挤距离
+        self.archive_new = 0  # 最近一次更新档案时新进入档案的解的个数
+        self.archive_size_list = []  # 每次迭代后的档案大小
+        super().__init__(dim, size, iter_num, x_max, max_vel, -float('Inf'), float('nan'), C1=C1, C2=C2, W=W,
+                         fit_func=fit_func, batch=batch, executor=executor, chunk_size=chunk_size, seed=seed,
+                         checkpoint_path=checkpoint_path, checkpoint_every=checkpoint_every, callback=callback,
+                         patience=patience, min_delta=min_delta, metrics_every=metrics_every)
+
+    def checkpoint_state(self):
+        return {'archive_size': self.archive_size, 'archive_pos': self.archive_pos, 'archive_fit': self.archive_fit,
+                'archive_cd': self.archive_cd, 'archive_new': self.archive_new,
+                'archive_size_list': np.array(self.archive_size_list, dtype=int)}
+
+    def restore_state(self, data):
+        self.archive_size = int(data['archive_size'])
+        self.archive_pos, self.archive_fit, self.archive_cd = data['archive_pos'], data['archive_fit'], data['archive_cd']
+        self.archive_new = int(data['archive_new'])
+        self.archive_size_list = data['archive_size_list'].tolist()
+
+    # 从档案中为每个粒子选取引导者
+    def guide(self):
+        a = self.rng.integers(0, len(self.archive_cd), self.size)
+        b = self.rng.integers(0, len(self.archive_cd), self.size)
+        leader = np.where(self.archive_cd[a] >= self.archive_cd[b], a, b)
+        return self.archive_pos[leader]
+
+    # 更新位置以及个体最优：新解支配旧解时替换，互不支配时以 0.5 的概率替换
+    def update_pos(self):
+        self.pos += self.vel
+        value = self.evaluate(self.pos)
+        new_better = np.all(value <= self.fitness, axis=1) & np.any(value < self.fitness, axis=1)
+        old_better = np.all(self.fitness <= value, axis=1) & np.any(self.fitness < value, axis=1)
+        replace = new_better | (~old_better & (self.rng.random(self.size) < 0.5))
+        self.fitness[replace] = value[replace]
+        self.best_pos[replace] = self.pos[replace]
+        self.update_best(value)
+
+    # 用本次迭代的解更新档案
+    def update_best(self, value=None):
+        value = self.fitness if value is None else value
+        if self.archive_fit is None:
+            F, X = value, self.pos
+        else:
+            F, X = np.vstack([self.archive_fit, value]), np.vstack([self.archive_pos, self.pos])
+        n_old = len(F) - len(value)
+        _, origin = np.unique(F, axis=0, return_index=True)  # 去掉目标值重复的解，origin 为保留的解在 F 中的行号
+        mask = non_dominated(F[origin])
+        origin = origin[mask]
+        F, X = F[origin], X[origin]
+        distance = crowding_distance(F)
+        if len(F) > self.archive_size:
+            keep = np.argsort(-distance, kind='stable')[:self.archive_size]
+            F, X, origin = F[keep], X[keep], origin[keep]
+            distance = crowding_distance(F)
+        self.archive_fit, self.archive_pos, self.archive_cd = F, X.copy(), distance
+        self.archive_new = int(np.sum(origin >= n_old))
+
+    def update_ndim(self):
+
+        start = time.perf_counter() - (self.metrics[self.iter - 1, 3] if self.iter > 0 else 0.0)
+        while self.iter < self.iter_num:
+            self.update_vel()  # 更新速度
+            self.update_pos()  # 更新位置
+            self.iter += 1
+            self.archive_size_list.append(len(self.archive_fit))
+            # 以新进入档案的解的个数作为改进量判断停滞
+            if record_metrics(self, self.iter - 1, self.pos, self.vel, start, improvement=self.archive_new):
+                break
+            if self.checkpoint_path is not None and self.iter % self.checkpoint_every == 0:
+                self.save_checkpoint()
+        if self.checkpoint_path is not None:
+            self.save_checkpoint()
+
+        return self.archive_pos, self.archive_fit
@@ -1,23 +1,40 @@
+import importlib.util
+import os
+
+import numpy as np
+
+# 与AMP.py共用幂迭代求特征值和计算RI的函数
+# 按文件路径加载AMP.py，不把Tool目录加入sys.path（该目录下的sklearn.py等文件会遮蔽同名的第三方库）
+_AMP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'AMP.py')
+_spec = importlib.util.spec_from_file_location('AMP', _AMP_PATH)
+_AMP = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_AMP)
+power_eig, get_ri = _AMP.power_eig, _AMP.get_ri
+
+
 def AHP(matrix):
-    if isConsist(matrix):
-        lam, x = np.linalg.eig(matrix)
-        return x[0] / sum(x[0][:])
+    lam, w = power_eig(matrix)
+    if isConsist(matrix, lam)[0]:
+        return w
     else:
         print("一致性检验未通过")
         return None
 
-def isConsist(matrix):
+def isConsist(matrix, lam=None):
     '''
     :param matrix: 成对比较矩阵
+    :param lam: 已求得的最大特征值，为None时用幂迭代法计算
     :return:    通过一致性检验则返回true，否则返回false
     '''
     n = np.shape(matrix)[0]
-    a, b = np.linalg.eig(matrix)
-    maxlam = a[0].real
+    if lam is None:
+        lam, w = power_eig(matrix)
+    maxlam = lam
     CI = (maxlam - n) / (n - 1)
     RI = [0, 0, 0.58, 0.9, 1.12, 1.24, 1.32, 1.41, 1.45]
-    CR = CI / RI[n-1]
+    RI_n = RI[n-1] if n <= len(RI) else get_ri(n)  # 超出表格时使用AMP中的RI表（n > 15时用蒙特卡洛法计算）
+    CR = CI / RI_n
     if CR < 0.1:
-        return True, CI, RI[n-1]
+        return True, CI, RI_n
     else:
         return False, None, None
@@ -1,29 +1,308 @@
-% 本资料由公众号“数学建模老哥”原创免费发布！
+# 本资料由公众号“数学建模老哥”原创免费发布！
+
+import json
+import os
+import time
 
 import numpy as np
+
+# 平均随机一致性指标RI，下标为矩阵阶数减1
+RI_LIST = [0, 0, 0.52, 0.89, 1.12, 1.26, 1.36, 1.41, 1.46, 1.49, 1.52, 1.54, 1.56, 1.58, 1.59]
+# 1-9标度及其倒数，共17个取值
+SAATY_SCALE = np.array([1 / k for k in range(9, 1, -1)] + list(range(1, 10)), dtype=float)
+# 蒙特卡洛法得到的RI的缓存文件
+RI_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'ahp_random_index.json')
+
+
+def power_eig(array, tol=1e-12, max_iter=1000, w0=None):
+    """
+    幂迭代法求判断矩阵的最大特征值及对应的特征向量
+    正互反矩阵的最大特征值是唯一的正实数（Perron根），对应特征向量各分量为正，
+    只需反复左乘矩阵即可收敛，不必求出全部特征值
+    :param array: 判断矩阵
+    :param tol: 相邻两次特征向量各分量的最大变化小于tol时停止迭代
+    :param max_iter: 最大迭代次数
+    :param w0: 初始向量，默认取各行的几何平均（矩阵完全一致时即为精确解）
+    :return: (最大特征值, 和为1的特征向量)
+    """
+    array = np.asarray(array, dtype=float)
+    w = np.exp(np.mean(np.log(array), axis=1)) if w0 is None else np.asarray(w0, dtype=float)
+    w = w / np.sum(w)
+    lam = np.sum(array @ w)
+    for i in range(max_iter):
+        aw = array @ w
+        # w的分量和为1，因此Aw的分量和即为特征值的估计
+        lam = np.sum(aw)
+        w_new = aw / lam
+        converged = np.max(np.abs(w_new - w)) < tol
+        w = w_new
+        if converged:
+            break
+    return lam, w
+
+
+def batch_power_eig(arrays, tol=1e-12, max_iter=1000):
+    """
+    幂迭代法的批量版本，同时求一组同阶判断矩阵的最大特征值和特征向量
+    :param arrays: 判断矩阵组，形状为(k, n, n)
+    :param tol: 所有矩阵相邻两次特征向量各分量的最大变化都小于tol时停止迭代
+    :param max_iter: 最大迭代次数
+    :return: (最大特征值数组，形状为(k,)；和为1的特征向量，形状为(k, n))
+    """
+    arrays = np.asarray(arrays, dtype=float)
+    w = np.exp(np.mean(np.log(arrays), axis=2))
+    w /= np.sum(w, axis=1, keepdims=True)
+    lam = np.sum(np.matmul(arrays, w[..., None])[..., 0], axis=1)
+    for i in range(max_iter):
+        aw = np.matmul(arrays, w[..., None])[..., 0]
+        lam = np.sum(aw, axis=1)
+        w_new = aw / lam[:, None]
+        converged = np.max(np.abs(w_new - w)) < tol
+        w = w_new
+        if converged:
+            break
+    return lam, w
+
+
+def batch_ahp(arrays):
+    """
+    批量层次分析：一次向量化计算一组同阶判断矩阵的三种权重和一致性指标
+    :param arrays: 判断矩阵组，形状为(k, n, n)
+    :return: 字典，'arithmetic'、'geometric'、'eigenvalue'为三种方法的权重，形状为(k, n)；
+             'max_eig_val'、'CI'、'CR'形状为(k,)。n <= 2时不存在一致性问题，CR记为0
+    """
+    arrays = np.asarray(arrays, dtype=float)
+    n = arrays.shape[-1]
+    # 算术平均法：按列归一化后按行求平均
+    arithmetic = np.sum(arrays / np.sum(arrays, axis=1, keepdims=True), axis=2) / n
+    # 几何平均法：每行的几何平均再归一化
+    geometric = np.exp(np.mean(np.log(arrays), axis=2))
+    geometric /= np.sum(geometric, axis=1, keepdims=True)
+    # 特征值法
+    max_eig_val, eigenvalue = batch_power_eig(arrays)
+    CI = (max_eig_val - n) / (n - 1) if n > 1 else np.zeros(len(arrays))
+    RI = get_ri(n)
+    CR = CI / RI if RI > 0 else np.zeros(len(arrays))
+    return {'arithmetic': arithmetic, 'geometric': geometric, 'eigenvalue': eigenvalue,
+            'max_eig_val': max_eig_val, 'CI': CI, 'CR': CR}
+
+
+def group_ahp(arrays, expert_weights=None, cr_threshold=0.1, policy='drop'):
+    """
+    群组层次分析：对多位专家的同阶判断矩阵按加权几何平均集结，再求群组权重
+    :param arrays: 判断矩阵组，形状为(k, n, n)
+    :param expert_weights: 专家权重，形状为(k,)，默认等权
+    :param cr_threshold: 个体判断矩阵的CR不低于该值时视为未通过一致性检验
+    :param policy: 'drop'剔除未通过检验的专家；'reweight'将其权重乘以cr_threshold/CR；'keep'不处理
+    :return: 字典，'weights'为群组权重，'matrix'为集结后的判断矩阵，'max_eig_val'、'CI'、'CR'为其一致性指标；
+             'expert_weights'为实际使用的归一化专家权重，'individual_CR'为各专家判断矩阵的CR，
+             'disagreement'为各专家与群组结果的分歧度，即ln(a_ij) - ln(w_i/w_j)在非对角元上的均方值
+    """
+    arrays = np.asarray(arrays, dtype=float)
+    k, n = arrays.shape[0], arrays.shape[-1]
+    weights = np.ones(k) if expert_weights is None else np.array(expert_weights, dtype=float)
+    # 个体一致性检验
+    max_eig_val = batch_power_eig(arrays)[0]
+    RI = get_ri(n)
+    individual_CR = (max_eig_val - n) / (n - 1) / RI if RI > 0 else np.zeros(k)
+    failed = individual_CR >= cr_threshold
+    if policy == 'drop':
+        weights[failed] = 0
+    elif policy == 'reweight':
+        weights[failed] *= cr_threshold / individual_CR[failed]
+    elif policy != 'keep':
+        raise ValueError("policy只能为'drop'、'reweight'或'keep'")
+    if np.sum(weights) <= 0:
+        raise ValueError("没有可用于集结的判断矩阵")
+    weights /= np.sum(weights)
+    # 加权几何平均：对数域中的加权算术平均
+    log_arrays = np.log(arrays)
+    matrix = np.exp(np.tensordot(weights, log_arrays, axes=1))
+    lam, w = power_eig(matrix)
+    CI = (lam - n) / (n - 1) if n > 1 else 0.0
+    # 分歧度：个体判断与群组权重之比的对数偏差
+    log_w = np.log(w)
+    log_arrays -= log_w[:, None] - log_w[None, :]
+    disagreement = np.sum(log_arrays ** 2, axis=(1, 2)) / max(n * (n - 1), 1)
+    return {'weights': w, 'matrix': matrix, 'max_eig_val': lam, 'CI': CI, 'CR': CI / RI if RI > 0 else 0.0,
+            'expert_weights': weights, 'individual_CR': individual_CR, 'disagreement': disagreement}
+
+
+def random_eig_sum(n, n_samples, seed=None):
+    """
+    生成一批n阶随机正互反矩阵，上三角元素从1-9标度及其倒数中等可能抽取
+    :param n: 矩阵阶数
+    :param n_samples: 矩阵个数
+    :param seed: 随机数种子或SeedSequence
+    :return: 这批矩阵最大特征值之和
+    """
+    rng = np.random.default_rng(seed)
+    row, col = np.triu_indices(n, 1)
+    values = SAATY_SCALE[rng.integers(0, len(SAATY_SCALE), (n_samples, len(row)))]
+    arrays = np.ones((n_samples, n, n))
+    arrays[:, row, col] = values
+    arrays[:, col, row] = 1 / values
+    return float(np.sum(batch_power_eig(arrays, tol=1e-10)[0]))
+
+
+def read_ri_cache(cache_path):
+    """
+    读取RI缓存文件，文件不存在、无法读取或内容损坏时视为空缓存
+    :return: 字典，键为阶数的字符串，值为{'RI': RI值, 'n_samples': 样本数}
+    """
+    try:
+        with open(cache_path, encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def random_index(n, n_samples=10000, seed=None, batch_size=None, executor=None, cache_path=RI_CACHE_PATH):
+    """
+    用蒙特卡洛法计算任意阶数的平均随机一致性指标RI = (随机矩阵最大特征值的均值 - n) / (n - 1)
+    结果写入缓存文件，同一台机器上每个阶数只需计算一次（缓存的样本数不少于n_samples时直接使用）
+    :param n: 矩阵阶数
+    :param n_samples: 随机矩阵个数
+    :param seed: 随机数种子（整数或None），每批使用由它派生的独立种子；给定种子时只使用同一种子得到的缓存
+    :param batch_size: 每批的矩阵个数，默认使每批约占400万个浮点数
+    :param executor: concurrent.futures执行器（如ProcessPoolExecutor），为None时在当前进程中计算
+    :param cache_path: 缓存文件路径，为None时不使用缓存
+    :return: RI值
+    """
+    if n <= 2:
+        return 0.0
+    if seed is not None:
+        seed = int(seed)
+    if cache_path is not None:
+        entry = read_ri_cache(cache_path).get(str(n))
+        if isinstance(entry, dict) and entry.get('n_samples', 0) >= n_samples and 'RI' in entry \
+                and (seed is None or entry.get('seed') == seed):
+            return entry['RI']
+
+    if batch_size is None:
+        batch_size = max(1, 2 ** 22 // (n * n))
+    sizes = [min(batch_size, n_samples - start) for start in range(0, n_samples, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if executor is None:
+        eig_sums = list(map(random_eig_sum, [n] * len(sizes), sizes, seeds))
+    else:
+        eig_sums = list(executor.map(random_eig_sum, [n] * len(sizes), sizes, seeds))
+    RI = (sum(eig_sums) / n_samples - n) / (n - 1)
+
+    if cache_path is not None:
+        # 写入前重新读取，尽量保留其他进程期间写入的阶数；临时文件名带进程号，避免并发写同一个文件
+        tmp_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+            cache = read_ri_cache(cache_path)
+            cache[str(n)] = {'RI': RI, 'n_samples': n_samples, 'seed': seed}
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(cache, f)
+            os.replace(tmp_path, cache_path)
+        except OSError:  # 缓存不可写时只返回结果
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return RI
+
+
+def get_ri(n):
+    """
+    取n阶矩阵的RI值：n不超过15时查表，否则用蒙特卡洛法计算（结果有缓存，以n为种子，不同机器上结果相同）
+    """
+    if n <= len(RI_LIST):
+        return RI_LIST[n - 1]
+    return random_index(n, seed=n)
+
+
+def repair_consistency(array, target_cr=0.1, max_iter=None, alpha=1.0):
+    """
+    自动修正判断矩阵的一致性：每一步找出与w_i/w_j偏差最大的元素a_ij（以|ln(a_ij * w_j / w_i)|衡量），
+    将其向w_i/w_j调整（a_ji同步取倒数），直到CR小于target_cr
+    每步以上一步的特征向量作为幂迭代初值，只改动一对元素时通常几次迭代即可收敛
+    :param array: 判断矩阵
+    :param target_cr: 目标CR值
+    :param max_iter: 最多修改的次数，默认为n*n（同一元素可能被多次调整）
+    :param alpha: 调整步长，1表示直接替换为w_i/w_j，小于1时取两者的加权几何平均
+    :return: (修正后的判断矩阵, 修改记录)，修改记录的每个元素为(i, j, 原值, 新值, 修改后的CR)
+    """
+    array = np.array(array, dtype=float)
+    n = array.shape[0]
+    RI = get_ri(n)
+    if max_iter is None:
+        max_iter = n * n
+    lam, w = power_eig(array)
+    history = []
+    upper = np.triu(np.ones((n, n), dtype=bool), 1)
+    for step in range(max_iter):
+        if RI == 0 or (lam - n) / (n - 1) / RI < target_cr:
+            break
+        deviation = np.abs(np.log(array * w[None, :] / w[:, None]))
+        deviation[~upper] = -1
+        i, j = np.unravel_index(np.argmax(deviation), deviation.shape)
+        old = array[i, j]
+        new = old ** (1 - alpha) * (w[i] / w[j]) ** alpha
+        array[i, j] = new
+        array[j, i] = 1 / new
+        lam, w = power_eig(array, w0=w)
+        history.append((int(i), int(j), float(old), float(new), float((lam - n) / (n - 1) / RI)))
+    return array, history
+
+
+def benchmark_eig(sizes=(10, 50, 100, 200), repeat=20, seed=None):
+    """
+    比较幂迭代法与np.linalg.eig求最大特征值的耗时
+    测试矩阵由随机权重构成的一致矩阵加上对数正态扰动得到
+    :param sizes: 矩阵阶数
+    :param repeat: 每个阶数重复的次数
+    :return: 列表，每个元素为字典，包含阶数、两种方法的平均耗时（秒）和特征值的最大差
+    """
+    rng = np.random.default_rng(seed)
+    results = []
+    for n in sizes:
+        w = rng.uniform(1, 9, n)
+        log_noise = np.triu(rng.normal(0, 0.2, (n, n)), 1)
+        array = np.outer(w, 1 / w) * np.exp(log_noise - log_noise.T)
+        start = time.perf_counter()
+        for i in range(repeat):
+            eig_val = np.linalg.eig(array)[0]
+        eig_time = (time.perf_counter() - start) / repeat
+        start = time.perf_counter()
+        for i in range(repeat):
+            lam = power_eig(array)[0]
+        power_time = (time.perf_counter() - start) / repeat
+        results.append({'n': n, 'eig': eig_time, 'power': power_time,
+                        'diff': float(abs(np.max(eig_val.real) - lam))})
+    return results
+
+
 class AHP:
     """
     相关信息的传入和准备
     """
 
-    def __init__(self, array):
+    def __init__(self, array, method='power'):
         ## 记录矩阵相关信息
         self.array = array
         ## 记录矩阵大小
         self.n = array.shape[0]
         # 初始化RI值，用于一致性检验
-        self.RI_list = [0, 0, 0.52, 0.89, 1.12, 1.26, 1.36, 1.41, 1.46, 1.49, 1.52, 1.54, 1.56, 1.58,
-                        1.59]
-        # 矩阵的特征值和特征向量
-        self.eig_val, self.eig_vector = np.linalg.eig(self.array)
-        # 矩阵的最大特征值
-        self.max_eig_val = np.max(self.eig_val)
-        # 矩阵最大特征值对应的特征向量
-        self.max_eig_vector = self.eig_vector[:, np.argmax(self.eig_val)].real
+        self.RI_list = list(RI_LIST)
+        if method == 'eig':
+            # 矩阵的特征值和特征向量
+            self.eig_val, self.eig_vector = np.linalg.eig(self.array)
+            # 矩阵的最大特征值
+            self.max_eig_val = np.max(self.eig_val)
+            # 矩阵最大特征值对应的特征向量
+            self.max_eig_vector = self.eig_vector[:, np.argmax(self.eig_val)].real
+        else:
+            # 幂迭代法只求最大特征值及其特征向量，不保存全部特征值
+            self.eig_val, self.eig_vector = None, None
+            self.max_eig_val, self.max_eig_vector = power_eig(self.array)
         # 矩阵的一致性指标CI
         self.CI_val = (self.max_eig_val - self.n) / (self.n - 1)
         # 矩阵的一致性比例CR
-        self.CR_val = self.CI_val / (self.RI_list[self.n - 1])
+        self.CR_val = self.CI_val / get_ri(self.n)
 
     """
     一致性判断
@@ -65,10 +344,10 @@ class AHP:
     """
 
     def cal_weight__by_geometric_method(self):
-        # 求矩阵的每列的积
-        col_product = np.product(self.array, axis=0)
+        # 求矩阵的每行的积
+        row_product = np.prod(self.array, axis=1)
         # 将得到的积向量的每个分量进行开n次方
-        array_power = np.power(col_product, 1 / self.n)
+        array_power = np.power(row_product, 1 / self.n)
         # 将列向量归一化
         array_weight = array_power / np.sum(array_power)
         # 打印权重向量
@@ -89,6 +368,122 @@ class AHP:
         return array_weight
 
 
+class AHPHierarchy:
+    """
+    层次分析模型：目标层 -> 准则层 -> 子准则层 -> ... -> 方案层
+    每个非底层元素保存一个对其下层元素的判断矩阵，并缓存(最大特征值, 权重向量, CR)
+    修改某个判断矩阵只会使该元素、所在层的组合矩阵和总排序结果失效，其余元素不重新计算
+    """
+
+    def __init__(self, levels):
+        """
+        :param levels: 各层元素名称组成的列表，例如[['目标'], ['C1', 'C2'], ['P1', 'P2', 'P3']]
+                       某元素没有下层细分时，可在下一层中重复其名称，权重原样传递
+        """
+        self.levels = [list(level) for level in levels]
+        # 每层的元素名称 -> 层内下标
+        self.positions = [{name: i for i, name in enumerate(level)} for level in self.levels]
+        # 以(所在层, 元素名称)为键
+        self.matrices = {}
+        self.children = {}
+        self._results = {}
+        # 修改过的元素的旧权重向量，作为重新计算时幂迭代的初值
+        self._w0 = {}
+        self._level_matrices = {}
+        self._global = None
+
+    def _key(self, node):
+        # 同名元素出现在多层时，判断矩阵属于最下面一个非方案层
+        for l in range(len(self.levels) - 2, -1, -1):
+            if node in self.positions[l]:
+                return l, node
+        raise ValueError("元素" + str(node) + "不在目标层到倒数第二层中")
+
+    def set_matrix(self, node, array, children=None):
+        """
+        设置（或修改）某个元素对其下层元素的判断矩阵
+        :param node: 元素名称
+        :param array: 判断矩阵
+        :param children: 判断矩阵对应的下层元素名称，默认为下一层的全部元素
+        """
+        key = self._key(node)
+        l = key[0]
+        if children is None:
+            children = self.levels[l + 1]
+        for child in children:
+            if child not in self.positions[l + 1]:
+                raise ValueError(str(child) + "不是" + str(node) + "的下一层元素")
+        array = np.asarray(array, dtype=float)
+        if array.shape != (len(children), len(children)):
+            raise ValueError("判断矩阵的阶数与下层元素个数不一致")
+        self.matrices[key] = array
+        self.children[key] = list(children)
+        old = self._results.pop(key, None)
+        if old is not None and len(old[1]) == len(children):
+            self._w0[key] = old[1]
+        self._level_matrices.pop(l, None)
+        self._global = None
+
+    def result(self, node):
+        """
+        :return: 元素判断矩阵的(最大特征值, 权重向量, CR)，有缓存
+        """
+        key = self._key(node)
+        if key not in self._results:
+            array = self.matrices[key]
+            n = array.shape[0]
+            lam, w = power_eig(array, w0=self._w0.pop(key, None))
+            CI = (lam - n) / (n - 1) if n > 1 else 0.0
+            RI = get_ri(n)
+            self._results[key] = (lam, w, CI / RI if RI > 0 else 0.0)
+        return self._results[key]
+
+    def level_matrix(self, l):
+        """
+        第l层到第l+1层的组合矩阵W_l，第j列为第l层第j个元素对第l+1层各元素的权重
+        没有判断矩阵的元素若在下一层有同名元素则原样传递（对应单位阵的一列）
+        """
+        if l not in self._level_matrices:
+            W = np.zeros((len(self.levels[l + 1]), len(self.levels[l])))
+            for j, node in enumerate(self.levels[l]):
+                if (l, node) in self.matrices:
+                    rows = [self.positions[l + 1][child] for child in self.children[(l, node)]]
+                    W[rows, j] = self.result(node)[1]
+                elif node in self.positions[l + 1]:
+                    W[self.positions[l + 1][node], j] = 1
+                else:
+                    raise ValueError("元素" + str(node) + "缺少判断矩阵")
+            self._level_matrices[l] = W
+        return self._level_matrices[l]
+
+    def global_weights(self):
+        """
+        层次总排序：W = W_{L-1} ... W_1 W_0 · [1]，一次矩阵连乘得到方案层的全局权重
+        :return: 方案层各元素的全局权重
+        """
+        if self._global is None:
+            matrices = [self.level_matrix(l) for l in range(len(self.levels) - 1)][::-1]
+            matrices.append(np.ones(len(self.levels[0])))
+            self._global = np.linalg.multi_dot(matrices)
+        return self._global
+
+    def total_consist(self):
+        """
+        层次总排序一致性检验：CR = Σ(上层全局权重·下层各元素CI) / Σ(上层全局权重·下层各元素RI)
+        :return: 总排序的CR值
+        """
+        weights = np.ones(len(self.levels[0]))
+        CI_sum, RI_sum = 0.0, 0.0
+        for l in range(len(self.levels) - 1):
+            for j, node in enumerate(self.levels[l]):
+                if (l, node) in self.matrices:
+                    lam, w, CR = self.result(node)
+                    n = len(w)
+                    CI_sum += weights[j] * ((lam - n) / (n - 1) if n > 1 else 0.0)
+                    RI_sum += weights[j] * get_ri(n)
+            weights = self.level_matrix(l) @ weights
+        return CI_sum / RI_sum if RI_sum > 0 else 0.0
+
 if __name__ == "__main__":
     # 给出判断矩阵
     b = np.array([[1, 1 / 3, 1 / 8], [3, 1, 1 / 3], [8, 3, 1]])
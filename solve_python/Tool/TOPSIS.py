@@ -1,73 +1,262 @@
 import numpy as np  # 导入numpy包并将其命名为np
 
 ##定义正向化的函数
-def positivization(x,type,i):
+def positivization(x,type,i,best=None,interval=None,verbose=True):
 # x：需要正向化处理的指标对应的原始向量
 # typ：指标类型（1：极小型，2：中间型，3：区间型）
 # i：正在处理的是原始矩阵的哪一列
+# best：中间型指标的最佳值，interval：区间型指标的最佳区间(a, b)，未给出时才从键盘输入
+# verbose：是否打印处理进度
+    log = print if verbose else (lambda *args: None)
     if type == 1:  #极小型
-        print("第",i,"列是极小型，正向化中...")
+        log("第",i,"列是极小型，正向化中...")
         posit_x = x.max(0)-x
-        print("第",i,"列极小型处理完成")
-        print("--------------------------分隔--------------------------")
+        log("第",i,"列极小型处理完成")
+        log("--------------------------分隔--------------------------")
         return posit_x
     elif type == 2:  #中间型
-        print("第",i,"列是中间型")
-        best = int(input("请输入最佳值："))
+        log("第",i,"列是中间型")
+        if best is None:
+            best = int(input("请输入最佳值："))
         m = (abs(x-best)).max()
         posit_x = 1-abs(x-best)/m
-        print("第",i,"列中间型处理完成")
-        print("--------------------------分隔--------------------------")
+        log("第",i,"列中间型处理完成")
+        log("--------------------------分隔--------------------------")
         return posit_x
     elif type == 3:  #区间型
-        print("第",i,"列是区间型")
-        a,b = [int(l) for l in input("按顺序输入最佳区间的左右界，并用逗号隔开：").split(",")]
-        m = (np.append(a-x.min(),x.max()-b)).max()
-        x_row = x.shape[0]  #获取x的行数
-        posit_x = np.zeros((x_row,1),dtype=float)
-        for r in range(x_row):
-            if x[r] < a:
-               posit_x[r] = 1-(a-x[r])/m
-            elif x[r] > b:
-               posit_x[r] = 1-(x[r]-b)/m
+        log("第",i,"列是区间型")
+        if interval is None:
+            interval = [int(l) for l in input("按顺序输入最佳区间的左右界，并用逗号隔开：").split(",")]
+        a,b = interval
+        posit_x = positivize(x.reshape(-1, 1), [3], intervals=[(a, b)]).reshape(x.shape[0])
+        log("第",i,"列区间型处理完成")
+        log("--------------------------分隔--------------------------")
+        return posit_x
+
+
+def positivize(x_mat, criteria_types, best_values=None, intervals=None, out=None, bounds=None):
+    """
+    向量化的正向化：一次处理所有列，逐列在out中原地计算，不打印、不逐行循环
+    :param x_mat: 原始矩阵，形状为(n, m)
+    :param criteria_types: 各指标类型（0：极大型，1：极小型，2：中间型，3：区间型）
+    :param best_values: 中间型指标的最佳值，可用列下标索引的列表或字典
+    :param intervals: 区间型指标的最佳区间(a, b)，可用列下标索引的列表或字典
+    :param out: 预先分配的float数组，形状与x_mat相同，可以就是x_mat本身；默认新建
+    :param bounds: 各列的(最小值数组, 最大值数组)，分块处理时传入全体数据的统计量；默认由x_mat计算
+    :return: 正向化后的矩阵out
+    """
+    n, m = x_mat.shape
+    if out is None:
+        out = np.empty((n, m), dtype=float)
+    col_min, col_max = (x_mat.min(0), x_mat.max(0)) if bounds is None else bounds
+    tmp = None
+    for k in range(m):
+        x, col = x_mat[:, k], out[:, k]
+        if criteria_types[k] == 0:  #极大型
+            if col is not x:
+                col[:] = x
+        elif criteria_types[k] == 1:  #极小型
+            np.subtract(col_max[k], x, out=col)
+        elif criteria_types[k] == 2:  #中间型：1 - |x-best| / max|x-best|
+            best = best_values[k]
+            d = max(col_max[k] - best, best - col_min[k])
+            np.subtract(x, best, out=col)
+            np.abs(col, out=col)
+            col /= -d if d > 0 else -1
+            col += 1
+        elif criteria_types[k] == 3:  #区间型：1 - (max(a-x, 0) + max(x-b, 0)) / M
+            a, b = intervals[k]
+            d = max(a - col_min[k], col_max[k] - b)
+            if tmp is None:
+                tmp = np.empty(n, dtype=float)
+            np.subtract(a, x, out=tmp)
+            np.maximum(tmp, 0, out=tmp)
+            np.subtract(x, b, out=col)
+            np.maximum(col, 0, out=col)
+            col += tmp
+            col /= -d if d > 0 else -1
+            col += 1
+        else:
+            raise ValueError("指标类型只能为0、1、2、3")
+    return out
+
+
+def top_k(scores, k, index=None):
+    """
+    用argpartition部分选择得分最高的k个对象，只对这k个排序，避免对全部得分排序
+    :param scores: 得分
+    :param k: 选取的个数
+    :param index: scores对应的对象下标，默认为0..len(scores)-1
+    :return: (按得分从高到低排列的下标, 对应的得分)
+    """
+    scores = np.asarray(scores)
+    if k < len(scores):
+        part = np.argpartition(-scores, k - 1)[:k]
+    else:
+        part = np.arange(len(scores))
+    part = part[np.argsort(-scores[part], kind='stable')]
+    return (part if index is None else index[part]), scores[part]
+
+
+def topsis(matrix, weights=None, criteria_types=None, best_values=None, intervals=None, k=None):
+    """
+    TOPSIS综合评价，不读写文件、不需要键盘输入，可在批处理中直接调用
+    :param matrix: 原始矩阵，形状为(n, m)，n个评价对象，m个评价指标
+    :param weights: 指标权重，形状为(m,)，默认等权
+    :param criteria_types: 各指标类型（0：极大型，1：极小型，2：中间型，3：区间型），默认全部为极大型
+    :param best_values: 中间型指标的最佳值，可用列下标索引的列表或字典，如{2: 7}
+    :param intervals: 区间型指标的最佳区间，可用列下标索引的列表或字典，如{3: (10, 20)}
+    :param k: 只需要前k名时给出，此时不对全部得分排序
+    :return: (归一化后的得分，形状为(n,)；排名，1表示最好)；给出k时为(前k名的下标, 对应的得分)
+    """
+    x_mat = np.array(matrix, dtype=float)
+    n, m = x_mat.shape
+    ## 正向化
+    if criteria_types is not None:
+        positivize(x_mat, criteria_types, best_values, intervals, out=x_mat)
+    ## 标准化
+    Z = x_mat / np.sqrt((x_mat * x_mat).sum(axis=0))
+    ## 加权距离，等权时与不加权的得分相同
+    weights = np.full(m, 1 / m) if weights is None else np.asarray(weights, dtype=float)
+    D_P = np.sqrt(((Z - Z.max(0)) ** 2) @ weights)
+    D_N = np.sqrt(((Z - Z.min(0)) ** 2) @ weights)
+    S = D_N / (D_P + D_N)
+    std_S = S / S.sum()
+    if k is not None:
+        return top_k(std_S, k)
+    rank = np.empty(n, dtype=int)
+    rank[np.argsort(-std_S, kind='stable')] = np.arange(1, n + 1)
+    return std_S, rank
+
+
+def topsis_stream(source, out_path=None, weights=None, criteria_types=None, best_values=None, intervals=None,
+                  chunk_size=1_000_000, k=None):
+    """
+    分块的两遍TOPSIS，适用于无法整体读入内存的数据，峰值内存只与chunk_size和指标个数有关
+    第一遍统计各列的最小值、最大值和（平移后的）一阶、二阶和，由此得到正向化后各列的范数和正、负理想解；
+    第二遍逐块正向化、标准化并计算D+、D-和得分，写入输出文件，最后逐块归一化
+    :param source: .npy文件路径（以内存映射方式打开）或形状为(n, m)的数组/memmap
+    :param out_path: 得分输出的.npy文件路径，为None时在内存中返回
+    :param chunk_size: 每块的行数
+    :param k: 只需要前k名时给出，每块做部分选择后与已有的候选合并；out_path为None时不保存全部得分
+    其余参数同topsis
+    :return: 归一化后的得分，形状为(n,)（out_path不为None时为memmap）；给出k时为(前k名的下标, 对应的得分)
+    """
+    data = np.load(source, mmap_mode='r') if isinstance(source, str) else source
+    n, m = data.shape
+    if criteria_types is None:
+        criteria_types = [0] * m
+
+    ## 第一遍：各列的充分统计量
+    col_min, col_max = np.full(m, np.inf), np.full(m, -np.inf)
+    # 极大型、极小型列统计x-shift的和，中间型、区间型列统计偏差u的和（正向化后为1-u/d）
+    s1, s2 = np.zeros(m), np.zeros(m)
+    u_min, u_max = np.full(m, np.inf), np.full(m, -np.inf)
+    shift = None
+    for start in range(0, n, chunk_size):
+        chunk = np.asarray(data[start:start + chunk_size], dtype=float)
+        if shift is None:
+            shift = chunk.mean(0)
+        np.minimum(col_min, chunk.min(0), out=col_min)
+        np.maximum(col_max, chunk.max(0), out=col_max)
+        for j in range(m):
+            x = chunk[:, j]
+            if criteria_types[j] in (0, 1):
+                v = x - shift[j]
+            else:
+                if criteria_types[j] == 2:
+                    v = np.abs(x - best_values[j])
+                else:
+                    a, b = intervals[j]
+                    v = np.maximum(a - x, 0) + np.maximum(x - b, 0)
+                u_min[j] = min(u_min[j], v.min())
+                u_max[j] = max(u_max[j], v.max())
+            s1[j] += v.sum()
+            s2[j] += v @ v
+
+    ## 正向化后各列的平方和与最大、最小值
+    sq_sum, p_max, p_min = np.empty(m), np.empty(m), np.empty(m)
+    for j in range(m):
+        if criteria_types[j] == 0:
+            sq_sum[j] = s2[j] + 2 * shift[j] * s1[j] + n * shift[j] ** 2
+            p_max[j], p_min[j] = col_max[j], col_min[j]
+        elif criteria_types[j] == 1:
+            c = col_max[j] - shift[j]
+            sq_sum[j] = n * c ** 2 - 2 * c * s1[j] + s2[j]
+            p_max[j], p_min[j] = col_max[j] - col_min[j], 0
+        else:
+            if criteria_types[j] == 2:
+                d = max(col_max[j] - best_values[j], best_values[j] - col_min[j])
+            else:
+                d = max(intervals[j][0] - col_min[j], col_max[j] - intervals[j][1])
+            d = d if d > 0 else 1
+            sq_sum[j] = n - 2 * s1[j] / d + s2[j] / d ** 2
+            p_max[j], p_min[j] = 1 - u_min[j] / d, 1 - u_max[j] / d
+    norm = np.sqrt(sq_sum)
+    z_max, z_min = p_max / norm, p_min / norm
+    weights = np.full(m, 1 / m) if weights is None else np.asarray(weights, dtype=float)
+
+    ## 第二遍：逐块计算得分
+    if out_path is None:
+        std_S = np.empty(n) if k is None else None
+    else:
+        std_S = np.lib.format.open_memmap(out_path, mode='w+', dtype=float, shape=(n,))
+    buf = np.empty((min(chunk_size, n), m))
+    diff = np.empty_like(buf)
+    S_sum = 0.0
+    for start in range(0, n, chunk_size):
+        chunk = np.asarray(data[start:start + chunk_size], dtype=float)
+        rows = len(chunk)
+        Z = positivize(chunk, criteria_types, best_values, intervals, out=buf[:rows], bounds=(col_min, col_max))
+        Z /= norm
+        d = diff[:rows]
+        np.subtract(Z, z_max, out=d)
+        d *= d
+        D_P = np.sqrt(d @ weights)
+        np.subtract(Z, z_min, out=d)
+        d *= d
+        D_N = np.sqrt(d @ weights)
+        D_P += D_N
+        np.divide(D_N, D_P, out=D_N)
+        if std_S is not None:
+            std_S[start:start + rows] = D_N
+        S_sum += D_N.sum()
+        if k is not None:
+            idx, val = top_k(D_N, k)
+            if start > 0:
+                idx, val = top_k(np.concatenate([top_val, val]), k, np.concatenate([top_idx, idx + start]))
             else:
-               posit_x[r] = 1
-        print("第",i,"列区间型处理完成")
-        print("--------------------------分隔--------------------------")
-        return posit_x.reshape(x_row)
-
-
-## 第一步：从外部导入数据
-#注：保证表格不包含除数字以外的内容
-x_mat = np.loadtxt('river.csv', encoding='UTF-8-sig', delimiter=',')  # 推荐使用csv格式文件
-
-## 第二步：判断是否需要正向化
-n, m = x_mat.shape
-print("共有", n, "个评价对象", m, "个评价指标")
-judge = int(input("指标是否需要正向化处理，需要请输入1，不需要则输入0："))
-if judge == 1:
-    position = np.array([int(i) for i in input("请输入需要正向化处理的指标所在的列，例如第1、3、4列需要处理，则输入1,3,4").split(',')])
-    position = position-1
-    typ = np.array([int(j) for j in input("请按照顺序输入这些列的指标类型（1：极小型，2：中间型，3：区间型）格式同上").split(',')])
-    for k in range(position.shape[0]):
-        x_mat[:, position[k]] = positivization(x_mat[:, position[k]], typ[k], position[k])
-    print("正向化后的矩阵：", x_mat)
-
-## 第三步：对正向化后的矩阵进行标准化
-tep_x1 = (x_mat * x_mat).sum(axis=0)  # 每个元素平方后按列相加
-tep_x2 = np.tile(tep_x1, (n, 1))  # 将矩阵tep_x1平铺n行
-Z = x_mat / ((tep_x2) ** 0.5)  # Z为标准化矩阵
-print("标准化后的矩阵为：", Z)
-
-## 第四步：计算与最大值和最小值的距离，并算出得分
-tep_max = Z.max(0)  # 得到Z中每列的最大值
-tep_min = Z.min(0)  # 每列的最小值
-tep_a = Z - np.tile(tep_max, (n, 1))  # 将tep_max向下平铺n行,并与Z中的每个对应元素做差
-tep_i = Z - np.tile(tep_min, (n, 1))  # 将tep_max向下平铺n行，并与Z中的每个对应元素做差
-D_P = ((tep_a ** 2).sum(axis=1)) ** 0.5  # D+与最大值的距离向量
-D_N = ((tep_i ** 2).sum(axis=1)) ** 0.5
-S = D_N / (D_P + D_N)  # 未归一化的得分
-std_S = S / S.sum(axis=0)
-sorted_S = np.sort(std_S, axis=0)
-print(std_S)  # 打印标准化后的得分
-## std_S.to_csv(std_S.csv)  结果输出到std_S.csv文件
+                idx = idx + start
+            top_idx, top_val = idx, val
+    if std_S is not None:
+        for start in range(0, n, chunk_size):
+            std_S[start:start + chunk_size] /= S_sum
+    if out_path is not None:
+        std_S.flush()
+    if k is not None:
+        return top_idx, top_val / S_sum
+    return std_S
+
+
+if __name__ == '__main__':
+    ## 第一步：从外部导入数据
+    #注：保证表格不包含除数字以外的内容
+    x_mat = np.loadtxt('river.csv', encoding='UTF-8-sig', delimiter=',')  # 推荐使用csv格式文件
+
+    ## 第二步：判断是否需要正向化
+    n, m = x_mat.shape
+    print("共有", n, "个评价对象", m, "个评价指标")
+    judge = int(input("指标是否需要正向化处理，需要请输入1，不需要则输入0："))
+    if judge == 1:
+        position = np.array([int(i) for i in input("请输入需要正向化处理的指标所在的列，例如第1、3、4列需要处理，则输入1,3,4").split(',')])
+        position = position-1
+        typ = np.array([int(j) for j in input("请按照顺序输入这些列的指标类型（1：极小型，2：中间型，3：区间型）格式同上").split(',')])
+        for k in range(position.shape[0]):
+            x_mat[:, position[k]] = positivization(x_mat[:, position[k]], typ[k], position[k])
+        print("正向化后的矩阵：", x_mat)
+
+    ## 第三步：标准化，并计算与最大值和最小值的距离，算出得分
+    std_S, rank = topsis(x_mat)
+    print(std_S)  # 打印标准化后的得分
+    print(rank)  # 打印排名
+    ## std_S.to_csv(std_S.csv)  结果输出到std_S.csv文件